@@ -0,0 +1,75 @@
+import os
+import json
+
+
+ENV_PREFIX = "SIXPM_"
+TRUE_STRINGS = {"1", "true", "yes", "on"}
+FALSE_STRINGS = {"0", "false", "no", "off", ""}
+
+
+def coerce(name, raw, default):
+    """Converts a config-file or environment value to the type of its default."""
+    if isinstance(default, bool):
+        if isinstance(raw, bool):
+            return raw
+        value = str(raw).strip().lower()
+        if value in TRUE_STRINGS:
+            return True
+        if value in FALSE_STRINGS:
+            return False
+        raise ValueError(f"{name}: expected true/false, got {raw!r}")
+    if isinstance(default, (int, float)):
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}: expected a number, got {raw!r}") from None
+        if isinstance(default, float):
+            return value
+        # Whole-number settings (page counts, sizes) accept "5" or 5.0 but never silently truncate 2.5
+        if not value.is_integer():
+            raise ValueError(f"{name}: expected a whole number, got {raw!r}")
+        return int(value)
+    if isinstance(default, (list, tuple)):
+        if isinstance(raw, (list, tuple)):
+            return list(raw)
+        raw = str(raw).strip()
+        # Env vars can hold a JSON list or a comma-separated one
+        if raw.startswith("["):
+            return json.loads(raw)
+        return [item.strip() for item in raw.split(",") if item.strip()]
+    if raw is None:
+        return None
+    return str(raw) if default is not None else raw
+
+
+def load_settings(defaults, path=None, environ=None, overrides=None):
+    """
+    Merges settings in increasing priority: defaults < JSON config file < SIXPM_* env vars < overrides.
+    Keys are the upper-case names in `defaults`; unknown keys in the file are reported and ignored.
+    Returns a new dict holding only the keys that differ from `defaults`.
+    """
+    environ = os.environ if environ is None else environ
+    settings = {}
+
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            file_values = json.load(f)
+        for key, raw in file_values.items():
+            name = key.upper()
+            if name not in defaults:
+                print(f"[WARN] Unknown setting '{key}' in {path}; ignoring it.")
+                continue
+            settings[name] = coerce(name, raw, defaults[name])
+
+    for name, default in defaults.items():
+        env_name = ENV_PREFIX + name
+        if env_name in environ:
+            settings[name] = coerce(env_name, environ[env_name], default)
+
+    for name, raw in (overrides or {}).items():
+        name = name.upper()
+        if name not in defaults:
+            raise KeyError(f"Unknown setting '{name}'")
+        settings[name] = coerce(name, raw, defaults[name])
+
+    return {name: value for name, value in settings.items() if value != defaults[name]}
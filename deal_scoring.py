@@ -0,0 +1,154 @@
+import os
+import time
+from urllib.parse import urlparse
+
+# NumPy is imported on first DealScorer() so category_from_url stays cheap to import
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for deal scoring (pip install numpy)") from None
+        np = numpy
+
+
+# Discounts live in [0, 100], so code * KEY_STRIDE + discount gives a sortable (group, value) key
+KEY_STRIDE = 1000.0
+# Floor for the standard deviation (in discount points). Without it a brand that is
+# always exactly 40% off makes 42% look like a 2-sigma event.
+MIN_STD = 5.0
+
+
+def category_from_url(url):
+    """Derives a category label like 'womens/shoes' from a 6pm search URL path."""
+    segments = [s for s in urlparse(url).path.split("/") if s]
+    # The last segment is the opaque search token (e.g. 'CK_XAcABAeICAgEY.zso')
+    if segments and segments[-1].endswith(".zso"):
+        segments = segments[:-1]
+    return "/".join(segments[:2]).lower() or "all"
+
+
+def _group_stats(codes, values, n_groups):
+    """Per-group count, mean and std in a single bincount pass."""
+    counts = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    sq_sums = np.bincount(codes, weights=values * values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, 0.0)
+        variances = np.where(counts > 0, sq_sums / counts - means * means, 0.0)
+    stds = np.maximum(np.sqrt(np.maximum(variances, 0.0)), MIN_STD)
+    return counts, means, stds
+
+
+def _percentile_rank(sorted_keys, group_starts, counts, query_codes, query_values):
+    """Mid-rank percentile of each query value within its own group's history (0-100)."""
+    query_keys = query_codes * KEY_STRIDE + query_values
+    below = np.searchsorted(sorted_keys, query_keys, side="left") - group_starts[query_codes]
+    at_or_below = np.searchsorted(sorted_keys, query_keys, side="right") - group_starts[query_codes]
+    group_n = counts[query_codes]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.where(group_n > 0, (below + at_or_below) / 2.0 / group_n * 100.0, np.nan)
+    return pct
+
+
+class DealScorer:
+    """
+    Keeps a rolling history of (timestamp, brand, category, discount) observations
+    and scores each page's batch against per-brand and per-category distributions.
+    """
+
+    def __init__(self, path, history_days=30, max_rows=500_000):
+        _load_numpy()
+        self.path = path
+        self.history_seconds = int(history_days * 86400)
+        self.max_rows = max_rows
+        self.brands = {} # label -> code
+        self.categories = {}
+        self.ts = np.empty(0, dtype=np.int64)
+        self.brand_codes = np.empty(0, dtype=np.int64)
+        self.category_codes = np.empty(0, dtype=np.int64)
+        self.discounts = np.empty(0, dtype=np.float64)
+        if os.path.exists(path):
+            self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            self.brands = {label: i for i, label in enumerate(data["brand_labels"].tolist())}
+            self.categories = {label: i for i, label in enumerate(data["category_labels"].tolist())}
+            self.ts = data["ts"].astype(np.int64)
+            self.brand_codes = data["brand_codes"].astype(np.int64)
+            self.category_codes = data["category_codes"].astype(np.int64)
+            # Discounts are percentages rounded to 2 places (calculate_discount); re-rounding
+            # repairs histories written as float32 so ties with new queries compare equal
+            self.discounts = np.round(data["discounts"].astype(np.float64), 2)
+
+    def save(self):
+        """Trims history to the rolling window and writes it back to disk."""
+        self._trim()
+        tmp_path = self.path + ".tmp.npz" # np.savez appends .npz unless it's already there
+        np.savez(
+            tmp_path,
+            brand_labels=np.array(list(self.brands), dtype=str),
+            category_labels=np.array(list(self.categories), dtype=str),
+            ts=self.ts,
+            brand_codes=self.brand_codes,
+            category_codes=self.category_codes,
+            discounts=self.discounts, # float64: float32 would break exact ties in _percentile_rank
+        )
+        os.replace(tmp_path, self.path)
+
+    def _trim(self, now=None):
+        now = int(time.time()) if now is None else int(now)
+        keep = self.ts >= now - self.history_seconds
+        if keep.sum() > self.max_rows:
+            # Keep the newest rows (history is appended in time order)
+            keep[: np.flatnonzero(keep)[-self.max_rows]] = False
+        if not keep.all():
+            self.ts = self.ts[keep]
+            self.brand_codes = self.brand_codes[keep]
+            self.category_codes = self.category_codes[keep]
+            self.discounts = self.discounts[keep]
+    # --- End Persistence ---
+
+    def _encode(self, labels, vocab):
+        return np.fromiter((vocab.setdefault(label, len(vocab)) for label in labels), dtype=np.int64, count=len(labels))
+
+    def _score_against(self, hist_codes, query_codes, query_values, n_groups):
+        counts, means, stds = _group_stats(hist_codes, self.discounts, n_groups)
+        order = np.lexsort((self.discounts, hist_codes))
+        sorted_keys = hist_codes[order] * KEY_STRIDE + self.discounts[order]
+        group_starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        z = (query_values - means[query_codes]) / stds[query_codes]
+        z = np.where(counts[query_codes] > 0, z, np.nan)
+        pct = _percentile_rank(sorted_keys, group_starts, counts, query_codes, query_values)
+        return z, pct, counts[query_codes].astype(np.int64)
+
+    def score_batch(self, brands, categories, discounts):
+        """
+        Scores a batch against the current history (the batch itself is not included).
+        Returns a dict of arrays aligned with the input: brand_z, brand_pct, brand_n,
+        category_z, category_pct, category_n. Groups with no history score NaN.
+        """
+        brand_q = self._encode(brands, self.brands)
+        category_q = self._encode(categories, self.categories)
+        values = np.asarray(discounts, dtype=np.float64)
+
+        brand_z, brand_pct, brand_n = self._score_against(self.brand_codes, brand_q, values, len(self.brands))
+        category_z, category_pct, category_n = self._score_against(self.category_codes, category_q, values, len(self.categories))
+        return {
+            "brand_z": brand_z, "brand_pct": brand_pct, "brand_n": brand_n,
+            "category_z": category_z, "category_pct": category_pct, "category_n": category_n,
+        }
+
+    def add_batch(self, brands, categories, discounts, ts=None):
+        """Appends a batch of observations to the in-memory history."""
+        ts = int(time.time()) if ts is None else int(ts)
+        self.ts = np.concatenate((self.ts, np.full(len(discounts), ts, dtype=np.int64)))
+        self.brand_codes = np.concatenate((self.brand_codes, self._encode(brands, self.brands)))
+        self.category_codes = np.concatenate((self.category_codes, self._encode(categories, self.categories)))
+        self.discounts = np.concatenate((self.discounts, np.asarray(discounts, dtype=np.float64)))
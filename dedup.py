@@ -0,0 +1,176 @@
+import os
+import math
+import struct
+import hashlib
+
+
+# Header: magic, bit count (m), hash count (k), items added to this generation
+HEADER = struct.Struct("<4sQII")
+MAGIC = b"6PMB"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter; memory is ceil(m / 8) bytes no matter how many items are added."""
+
+    def __init__(self, capacity, error_rate=0.001, num_bits=None, num_hashes=None):
+        if num_bits is None:
+            num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        if num_hashes is None:
+            num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data, capacity):
+        magic, num_bits, num_hashes, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a Bloom filter generation")
+        bloom = cls(capacity, num_bits=num_bits, num_hashes=num_hashes)
+        body = data[HEADER.size:HEADER.size + len(bloom.bits)]
+        if len(body) != len(bloom.bits):
+            raise ValueError("truncated Bloom filter generation")
+        bloom.bits[:] = body
+        bloom.count = count
+        return bloom
+
+
+class SeenFilter:
+    """
+    De-duplication by style ID: an exact in-memory set for the current run,
+    backed by a persisted two-generation Bloom filter for earlier runs.
+    When the current generation fills up it becomes the previous one and a fresh
+    generation starts, so the file stays bounded and very old entries age out.
+    """
+
+    def __init__(self, path, capacity=200_000, error_rate=0.001):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.run_seen = set()
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = None
+        # Counters for the end-of-run report
+        self.run_hits = 0 # duplicates within this run (skipped before extraction)
+        self.history_hits = 0 # already seen in an earlier run
+        self.misses = 0 # genuinely new this run
+        self.alert_hits = 0 # alerts suppressed because the same deal was already sent
+        # Marks made while a queue worker's page is in flight (see begin_page)
+        self._page_run_keys = None
+        self._page_keys = None
+        if os.path.exists(path):
+            self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        try:
+            self.current = BloomFilter.from_bytes(data, self.capacity)
+            offset = HEADER.size + len(self.current.bits)
+            if len(data) > offset:
+                self.previous = BloomFilter.from_bytes(data[offset:], self.capacity)
+        except (ValueError, struct.error) as e:
+            print(f"[WARN] Seen-filter file '{self.path}' is unreadable ({e}); starting fresh.")
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.previous = None
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.current.to_bytes())
+            if self.previous is not None:
+                f.write(self.previous.to_bytes())
+        os.replace(tmp_path, self.path)
+    # --- End Persistence ---
+
+    def seen_in_run(self, key):
+        """True (and counted) if key was already processed earlier in this run; otherwise marks it."""
+        if key in self.run_seen:
+            self.run_hits += 1
+            return True
+        self.run_seen.add(key)
+        if self._page_run_keys is not None:
+            self._page_run_keys.append(key)
+        return False
+
+    def seen_before(self, key):
+        """True if key is (probably) in the persisted filter from an earlier run."""
+        found = key in self.current or (self.previous is not None and key in self.previous)
+        if found:
+            self.history_hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def alert_already_sent(self, key):
+        """Like seen_before, but counted separately for alert keys."""
+        found = key in self.current or (self.previous is not None and key in self.previous)
+        if found:
+            self.alert_hits += 1
+        return found
+
+    def remember(self, key):
+        """Adds key to the persisted filter, rotating generations when the current one is full."""
+        if self._page_keys is not None:
+            self._page_keys.append(key) # Held back until commit_page()
+            return
+        self._add(key)
+
+    def _add(self, key):
+        if self.current.is_full():
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+        self.current.add(key)
+
+    # --- Per-Page Staging (queue workers) ---
+    # A leased page can fail half-way and be retried, possibly by this same worker.
+    # Between begin_page() and commit_page()/rollback_page(), in-run marks are tracked
+    # and remember() is deferred, so a retried page isn't skipped as a duplicate of itself.
+    def begin_page(self):
+        self._page_run_keys = []
+        self._page_keys = []
+
+    def commit_page(self):
+        """Makes the current page's marks permanent; call once its result is committed."""
+        keys = self._page_keys or []
+        self._page_run_keys = self._page_keys = None
+        for key in keys:
+            self._add(key)
+
+    def rollback_page(self):
+        """Forgets everything the current page marked, as if it had never been scraped."""
+        self.run_seen.difference_update(self._page_run_keys or [])
+        self._page_run_keys = self._page_keys = None
+    # --- End Per-Page Staging ---
+
+    def stats_line(self):
+        return (
+            f"De-dup: {self.run_hits} in-run duplicates skipped, "
+            f"{self.history_hits} seen in earlier runs, {self.misses} new, "
+            f"{self.alert_hits} duplicate alerts suppressed "
+            f"(filter: {self.current.count}/{self.capacity} in current generation)."
+        )
@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from email.utils import parsedate_to_datetime
+
+# Only import aiohttp if available (enrichment is disabled without it)
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None # Define it as None if library not installed
+
+
+# --- HTTP Cache ---
+class HttpCache:
+    """
+    On-disk HTTP cache: one JSON metadata file + one body file per URL.
+    Honors Cache-Control max-age / no-store and revalidates with ETag / Last-Modified.
+    """
+
+    def __init__(self, cache_dir, default_max_age=0):
+        self.cache_dir = cache_dir
+        self.default_max_age = default_max_age
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json"), os.path.join(self.cache_dir, key + ".body")
+
+    def get(self, url):
+        """Returns (meta, body) for a cached URL, or (None, None)."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            return meta, body
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, None
+
+    def is_fresh(self, meta, now=None):
+        now = time.time() if now is None else now
+        return meta is not None and meta.get("expires_at", 0) > now
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def _expires_at(self, headers, now):
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-cache" in cache_control:
+            return now # Always revalidate
+        match = re.search(r"max-age=(\d+)", cache_control)
+        if match:
+            return now + int(match.group(1))
+        if headers.get("Expires"):
+            try:
+                return parsedate_to_datetime(headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return now + self.default_max_age
+
+    def store(self, url, headers, body, now=None):
+        """Caches a 200 response unless it's marked no-store."""
+        if "no-store" in headers.get("Cache-Control", "").lower():
+            return
+        now = time.time() if now is None else now
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "expires_at": self._expires_at(headers, now),
+            "stored_at": now,
+        }
+        meta_path, body_path = self._paths(url)
+        with open(body_path, "wb") as f:
+            f.write(body)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def refresh(self, url, meta, headers, now=None):
+        """Updates freshness after a 304 Not Modified, keeping the cached body."""
+        now = time.time() if now is None else now
+        meta["expires_at"] = self._expires_at(headers, now)
+        meta["etag"] = headers.get("ETag", meta.get("etag"))
+        meta["last_modified"] = headers.get("Last-Modified", meta.get("last_modified"))
+        meta_path, _ = self._paths(url)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def prune(self, max_age=None, max_bytes=None, now=None):
+        """
+        Deletes entries not stored or revalidated in the last max_age seconds, then the
+        least recently validated ones until the cache fits in max_bytes. Bodies without
+        metadata (left by an interrupted store) are always removed. Returns entries removed.
+        """
+        now = time.time() if now is None else now
+        entries = {} # key -> [last validated (meta mtime), total size]
+        orphans = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                key, ext = os.path.splitext(entry.name)
+                if ext not in (".json", ".body"):
+                    continue
+                stat = entry.stat()
+                slot = entries.setdefault(key, [None, 0])
+                slot[1] += stat.st_size
+                if ext == ".json":
+                    slot[0] = stat.st_mtime
+        for key, (validated_at, _) in entries.items():
+            if validated_at is None:
+                orphans.append(key)
+
+        doomed = set(orphans)
+        live = sorted((slot[0], key) for key, slot in entries.items() if slot[0] is not None)
+        if max_age is not None:
+            doomed.update(key for validated_at, key in live if validated_at < now - max_age)
+        if max_bytes is not None:
+            total = sum(entries[key][1] for _, key in live if key not in doomed)
+            for _, key in live: # Oldest first
+                if total <= max_bytes:
+                    break
+                if key not in doomed:
+                    doomed.add(key)
+                    total -= entries[key][1]
+
+        for key in doomed:
+            for ext in (".json", ".body"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, key + ext))
+                except FileNotFoundError:
+                    pass
+        return len(doomed)
+# --- End HTTP Cache ---
+
+
+# --- Product Page Parsing ---
+def _extract_json_after(html, marker):
+    """Decodes the JSON object that starts right after `marker` in the page source."""
+    start = html.find(marker)
+    if start == -1:
+        return None
+    start = html.find("{", start)
+    if start == -1:
+        return None
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(html[start:])
+        return obj
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_product_page(html):
+    """
+    Pulls size availability and color variants out of a 6pm product page.
+    Tries the embedded app state first, then JSON-LD. Returns a dict with
+    'color_variants', 'available_sizes' and 'in_stock' (None when unknown).
+    """
+    details = {"color_variants": [], "available_sizes": [], "in_stock": None}
+
+    # --- Embedded app state (Zappos/6pm platform) ---
+    state = _extract_json_after(html, "window.__INITIAL_STATE__")
+    styles = (((state or {}).get("product") or {}).get("detail") or {}).get("styles") or []
+    if styles:
+        sizes = set()
+        for style in styles:
+            color = style.get("color")
+            if color and color not in details["color_variants"]:
+                details["color_variants"].append(color)
+            for stock in style.get("stocks") or []:
+                try:
+                    on_hand = int(stock.get("onHand", 0))
+                except (TypeError, ValueError):
+                    on_hand = 0
+                if on_hand > 0 and stock.get("size"):
+                    sizes.add(str(stock["size"]))
+        details["available_sizes"] = sorted(sizes, key=_size_sort_key)
+        details["in_stock"] = bool(sizes)
+        return details
+
+    # --- JSON-LD fallback (less detail: colors and overall availability only) ---
+    for block in re.findall(r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>', html, re.S):
+        try:
+            data = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        for node in data if isinstance(data, list) else [data]:
+            if not isinstance(node, dict) or node.get("@type") != "Product":
+                continue
+            if node.get("color"):
+                details["color_variants"].append(node["color"])
+            offers = node.get("offers") or []
+            offers = offers if isinstance(offers, list) else [offers]
+            availability = [str(o.get("availability", "")) for o in offers if isinstance(o, dict)]
+            if availability:
+                details["in_stock"] = any(a.endswith("InStock") for a in availability)
+            return details
+    return details
+
+
+def _size_sort_key(size):
+    try:
+        return (0, float(size), size)
+    except ValueError:
+        return (1, 0.0, size)
+# --- End Product Page Parsing ---
+
+
+# --- Concurrent Fetching ---
+class EnrichmentStats:
+    def __init__(self):
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.fetched = 0
+        self.errors = 0
+
+    def summary(self):
+        return (
+            f"Enrichment: {self.cache_hits} cache hits, {self.not_modified} revalidated (304), "
+            f"{self.fetched} fetched, {self.errors} errors."
+        )
+
+
+async def _fetch_page(session, semaphore, cache, url, stats):
+    meta, body = cache.get(url)
+    if cache.is_fresh(meta):
+        stats.cache_hits += 1
+        return body.decode("utf-8", errors="replace")
+
+    async with semaphore:
+        async with session.get(url, headers=cache.conditional_headers(meta)) as response:
+            if response.status == 304 and body is not None:
+                cache.refresh(url, meta, response.headers)
+                stats.not_modified += 1
+                return body.decode("utf-8", errors="replace")
+            response.raise_for_status()
+            raw = await response.read()
+            cache.store(url, response.headers, raw)
+            stats.fetched += 1
+            return raw.decode(response.charset or "utf-8", errors="replace")
+
+
+async def _enrich_all(products, session, cache, concurrency, stats):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def enrich_one(product_info):
+        url = product_info.get("product_url")
+        if not url or not url.startswith("http"):
+            return
+        try:
+            html = await _fetch_page(session, semaphore, cache, url, stats)
+            product_info.update(parse_product_page(html))
+        except Exception as e:
+            stats.errors += 1
+            print(f"  [WARN] Enrichment failed for {url}: {e}")
+    await asyncio.gather(*(enrich_one(p) for p in products))
+
+
+class ProductEnricher:
+    """
+    Fetches product pages for alert candidates and merges size/color details into
+    each product dict in place. Keeps one event loop and one pooled aiohttp session
+    for its whole lifetime, so keep-alive connections are reused from page to page;
+    call close() at the end of the run (it also prunes the cache).
+    """
+
+    def __init__(self, cache_dir, concurrency=8, timeout=20, user_agent="Mozilla/5.0", default_max_age=3600,
+                 cache_max_age=None, cache_max_bytes=None):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for product enrichment (pip install aiohttp)")
+        self.cache = HttpCache(cache_dir, default_max_age=default_max_age)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cache_max_age = cache_max_age
+        self.cache_max_bytes = cache_max_bytes
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+
+    async def _get_session(self):
+        # Created inside the loop it will run on; limit_per_host keeps us polite to 6pm
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": self.user_agent, "Accept": "text/html"},
+            )
+        return self._session
+
+    async def _enrich(self, products, stats):
+        session = await self._get_session()
+        await _enrich_all(products, session, self.cache, self.concurrency, stats)
+
+    def enrich(self, products):
+        """Enriches the given products in place. Returns EnrichmentStats."""
+        stats = EnrichmentStats()
+        if products:
+            self._loop.run_until_complete(self._enrich(products, stats))
+        return stats
+
+    def close(self):
+        """Closes the session and loop, then prunes the cache to its configured limits."""
+        if self._loop.is_closed():
+            return 0
+        if self._session is not None:
+            self._loop.run_until_complete(self._session.close())
+            self._session = None
+        self._loop.close()
+        if self.cache_max_age is None and self.cache_max_bytes is None:
+            return 0
+        return self.cache.prune(max_age=self.cache_max_age, max_bytes=self.cache_max_bytes)
+# --- End Concurrent Fetching ---
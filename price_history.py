@@ -0,0 +1,380 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import hashlib
+from bisect import insort, bisect_left
+from array import array
+from collections import deque
+
+
+# --- File Layout ---
+# Header: magic + format version. Body: fixed-size records appended in arrival order.
+# Each record is (style key, unix timestamp in seconds, price in integer cents).
+HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<QqI")
+MAGIC = b"6PMH"
+VERSION = 1
+
+SECONDS_PER_DAY = 86400
+# The summary index is checkpointed next to the log (path + INDEX_SUFFIX) together with the
+# log offset it covers, so opening the store only replays the records appended since.
+# Layout: INDEX_HEADER, then n uint64 keys, n * INDEX_FIELDS int64 summary fields
+# (min, max, last, last_ts, count, values start, recent length, median FIFO length),
+# then the int64 values those lengths point into: recent (ts, cents) pairs and FIFO cents.
+INDEX_SUFFIX = ".idx"
+INDEX_HEADER = struct.Struct("<4sIqqIQ")
+INDEX_MAGIC = b"6PMI"
+INDEX_FIELDS = 8
+# --- End File Layout ---
+
+
+def _read_array(typecode, data, pos, count):
+    """Reads `count` little-endian items of an array typecode from data[pos:]; returns (array, new pos)."""
+    arr = array(typecode)
+    end = pos + count * arr.itemsize
+    if end > len(data):
+        raise ValueError("truncated checkpoint")
+    arr.frombytes(data[pos:end])
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr, end
+
+
+def style_key(style_id):
+    """Maps a 6pm style ID to the unsigned 64-bit key stored on disk."""
+    style_id = str(style_id).strip()
+    if style_id.isdigit() and int(style_id) < 2 ** 64:
+        return int(style_id)
+    # Non-numeric IDs (shouldn't happen on 6pm, but be safe) get a stable hash
+    return int.from_bytes(hashlib.blake2b(style_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def price_to_cents(price):
+    """Converts a float dollar price (as returned by parse_price) to integer cents."""
+    return int(round(float(price) * 100))
+
+
+class ProductSummary:
+    """Incrementally maintained per-product stats: min, max, last, rolling median."""
+
+    __slots__ = ("min_cents", "max_cents", "last_cents", "last_ts", "count", "recent", "_median_fifo", "_median_sorted")
+
+    def __init__(self, median_window):
+        self.min_cents = None
+        self.max_cents = None
+        self.last_cents = None
+        self.last_ts = None
+        self.count = 0
+        self.recent = deque() # (ts, cents) observations inside the retention window
+        self._median_fifo = deque(maxlen=median_window)
+        self._median_sorted = []
+
+    def add(self, ts, cents, retention_seconds):
+        if self.min_cents is None or cents < self.min_cents:
+            self.min_cents = cents
+        if self.max_cents is None or cents > self.max_cents:
+            self.max_cents = cents
+        if self.last_ts is None or ts >= self.last_ts:
+            self.last_ts = ts
+            self.last_cents = cents
+        self.count += 1
+
+        # Rolling median over the last N observations (sorted list kept in sync with a FIFO)
+        if len(self._median_fifo) == self._median_fifo.maxlen:
+            oldest = self._median_fifo[0]
+            del self._median_sorted[bisect_left(self._median_sorted, oldest)]
+        self._median_fifo.append(cents)
+        insort(self._median_sorted, cents)
+
+        # Window of recent observations, trimmed from the left as time moves on.
+        # A run of identical prices only needs its first and last sighting, so a
+        # product that never changes price costs two entries, not one per run.
+        recent = self.recent
+        if len(recent) >= 2 and recent[-1][1] == cents and recent[-2][1] == cents and ts >= recent[-1][0]:
+            recent[-1] = (ts, cents)
+        else:
+            recent.append((ts, cents))
+        cutoff = self.last_ts - retention_seconds
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.popleft()
+
+    def to_state(self):
+        """Plain-list form of this summary for the index checkpoint."""
+        return [self.min_cents, self.max_cents, self.last_cents, self.last_ts, self.count,
+                [v for entry in self.recent for v in entry], list(self._median_fifo)]
+
+    @classmethod
+    def from_state(cls, state, median_window):
+        summary = cls(median_window)
+        summary.min_cents, summary.max_cents, summary.last_cents, summary.last_ts, summary.count, recent, fifo = state
+        summary.recent.extend(zip(recent[::2], recent[1::2]))
+        summary._median_fifo.extend(fifo)
+        summary._median_sorted = sorted(summary._median_fifo)
+        return summary
+
+    @property
+    def median_cents(self):
+        values = self._median_sorted
+        if not values:
+            return None
+        mid = len(values) // 2
+        if len(values) % 2:
+            return values[mid]
+        return (values[mid - 1] + values[mid]) // 2
+
+    def window_min(self, since_ts):
+        """Lowest price observed at or after since_ts, or None if nothing in window."""
+        lowest = None
+        for ts, cents in reversed(self.recent):
+            if ts < since_ts:
+                break
+            if lowest is None or cents < lowest:
+                lowest = cents
+        return lowest
+
+
+class PriceHistoryStore:
+    """
+    Append-only price-history file keyed by style ID.
+    The file is memory-mapped on open to rebuild the in-memory summary index, starting
+    from the last index checkpoint (written by close() and compact()) when there is one;
+    every later observation is appended to disk and folded into the index incrementally.
+    A store file must have a single writing process.
+    """
+
+    def __init__(self, path, retention_days=90, median_window=30, max_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.retention_seconds = int(retention_days * SECONDS_PER_DAY)
+        self.median_window = median_window
+        self.max_bytes = max_bytes
+        self.index_path = path + INDEX_SUFFIX
+        self.index = {}
+        self._checkpoint = None
+        self._file = None
+        self._open()
+
+    # --- Loading ---
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            with open(self.path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path) # Left over from a log that no longer exists
+        else:
+            self._load()
+        self._file = open(self.path, "ab")
+
+    def _load_checkpoint(self, usable_end):
+        """Restores the index from its checkpoint; returns the log offset to replay from."""
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            magic, version, offset, retention_seconds, median_window, n = INDEX_HEADER.unpack_from(data, 0)
+            if (
+                magic != INDEX_MAGIC
+                or version != VERSION
+                or retention_seconds != self.retention_seconds
+                or median_window != self.median_window
+                or not HEADER.size <= offset <= usable_end
+                or (offset - HEADER.size) % RECORD.size
+            ):
+                raise ValueError("stale or mismatched checkpoint")
+            pos = INDEX_HEADER.size
+            keys, pos = _read_array("Q", data, pos, n)
+            fields, pos = _read_array("q", data, pos, n * INDEX_FIELDS)
+            values, pos = _read_array("q", data, pos, fields[-3] + 2 * fields[-2] + fields[-1] if n else 0)
+        except FileNotFoundError:
+            return HEADER.size
+        except (ValueError, struct.error) as e:
+            print(f"[WARN] Ignoring price-history index '{self.index_path}' ({e}); replaying the whole log.")
+            return HEADER.size
+        # Summaries stay as a row number into the checkpoint arrays until first used (see _summary)
+        self._checkpoint = (fields, values)
+        self.index = dict(zip(keys, range(n)))
+        return offset
+
+    def _checkpoint_state(self, row):
+        fields, values = self._checkpoint
+        min_cents, max_cents, last_cents, last_ts, count, start, n_recent, n_fifo = fields[row * INDEX_FIELDS:(row + 1) * INDEX_FIELDS]
+        recent_end = start + 2 * n_recent
+        return [min_cents, max_cents, last_cents, last_ts, count, values[start:recent_end], values[recent_end:recent_end + n_fifo]]
+
+    def save_index(self):
+        """Checkpoints the summary index and the log offset it covers."""
+        self._file.flush()
+        keys, fields, values = array("Q"), array("q"), array("q")
+        for key, summary in self.index.items():
+            state = self._checkpoint_state(summary) if isinstance(summary, int) else summary.to_state()
+            recent, fifo = state[5], state[6]
+            keys.append(key)
+            fields.extend(state[:5])
+            fields.extend((len(values), len(recent) // 2, len(fifo)))
+            values.extend(recent)
+            values.extend(fifo)
+        if sys.byteorder != "little":
+            for arr in (keys, fields, values):
+                arr.byteswap()
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, VERSION, os.path.getsize(self.path), self.retention_seconds, self.median_window, len(keys)
+            ))
+            for arr in (keys, fields, values):
+                f.write(arr.tobytes())
+        os.replace(tmp_path, self.index_path)
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, version = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError(f"'{self.path}' is not a v{VERSION} price-history file")
+                body_len = len(mm) - HEADER.size
+                # Ignore a torn trailing record left by an interrupted write
+                usable = body_len - (body_len % RECORD.size)
+                if usable != body_len:
+                    print(f"[WARN] Price history '{self.path}' has a partial trailing record; ignoring it.")
+                start = self._load_checkpoint(HEADER.size + usable)
+                view = memoryview(mm)[start:HEADER.size + usable]
+                try:
+                    for key, ts, cents in RECORD.iter_unpack(view):
+                        self._index_add(key, ts, cents)
+                finally:
+                    view.release()
+        if usable != body_len:
+            # Drop the torn bytes so new records stay aligned
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER.size + usable)
+    # --- End Loading ---
+
+    def _summary(self, key):
+        summary = self.index.get(key)
+        if isinstance(summary, int):
+            summary = self.index[key] = ProductSummary.from_state(self._checkpoint_state(summary), self.median_window)
+        return summary
+
+    def _index_add(self, key, ts, cents):
+        summary = self._summary(key)
+        if summary is None:
+            summary = self.index[key] = ProductSummary(self.median_window)
+        summary.add(ts, cents, self.retention_seconds)
+        return summary
+
+    def record(self, style_id, price, ts=None):
+        """Appends one observation (price in dollars) and updates the summary index."""
+        key = style_key(style_id)
+        cents = price_to_cents(price)
+        ts = int(time.time()) if ts is None else int(ts)
+        self._file.write(RECORD.pack(key, ts, cents))
+        self._file.flush()
+        return self._index_add(key, ts, cents)
+
+    def summary(self, style_id):
+        """Returns the ProductSummary for a style ID, or None if never seen."""
+        return self._summary(style_key(style_id))
+
+    def is_lowest_in(self, style_id, price, days=90, now=None):
+        """
+        True if price is at or below every earlier observation in the last `days` days.
+        Returns False when there is no earlier observation to compare against.
+        """
+        summary = self._summary(style_key(style_id))
+        if summary is None:
+            return False
+        now = int(time.time()) if now is None else int(now)
+        lowest = summary.window_min(now - int(days * SECONDS_PER_DAY))
+        return lowest is not None and price_to_cents(price) <= lowest
+
+    # --- Compaction ---
+    def size_bytes(self):
+        self._file.flush()
+        return os.path.getsize(self.path)
+
+    def compact_if_needed(self):
+        """Runs compact() when the file has grown past max_bytes."""
+        if self.max_bytes and self.size_bytes() > self.max_bytes:
+            return self.compact()
+        return False
+
+    def compact(self, now=None):
+        """
+        Rewrites the file keeping only observations inside the retention window,
+        plus each product's all-time min/max and last record so summaries survive.
+        Runs of identical prices collapse to their first and last sighting, and if
+        the result still doesn't fit in half of max_bytes the oldest records are
+        dropped (anchors last) so the file stays bounded.
+        """
+        now = int(time.time()) if now is None else int(now)
+        cutoff = now - self.retention_seconds
+        self._file.close()
+
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)[HEADER.size:]
+                try:
+                    records = list(RECORD.iter_unpack(view))
+                finally:
+                    view.release()
+
+        # First pass: find the single record that carries each product's min/max/last
+        anchors = {}
+        for i, (key, ts, cents) in enumerate(records):
+            lo, hi, last = anchors.get(key, (i, i, i))
+            if cents < records[lo][2]: lo = i
+            if cents > records[hi][2]: hi = i
+            if ts >= records[last][1]: last = i
+            anchors[key] = (lo, hi, last)
+        anchor_idx = set()
+        for lo, hi, last in anchors.values():
+            anchor_idx.update((lo, hi, last))
+
+        # Second pass: in-window records, minus the middle of same-price runs
+        by_key = {}
+        for i, (key, ts, cents) in enumerate(records):
+            if ts >= cutoff or i in anchor_idx:
+                by_key.setdefault(key, []).append(i)
+        keep_idx = []
+        for idxs in by_key.values():
+            for n, i in enumerate(idxs):
+                cents = records[i][2]
+                interior = 0 < n < len(idxs) - 1 and records[idxs[n - 1]][2] == cents == records[idxs[n + 1]][2]
+                if i in anchor_idx or not interior:
+                    keep_idx.append(i)
+
+        # Hard bound: target half of max_bytes so we don't compact again on the very next run
+        if self.max_bytes:
+            budget = max((self.max_bytes // 2 - HEADER.size) // RECORD.size, 0)
+            if len(keep_idx) > budget:
+                # Newest first, anchors ahead of ordinary records
+                keep_idx.sort(key=lambda i: (i in anchor_idx, records[i][1], i), reverse=True)
+                keep_idx = keep_idx[:budget]
+        keep_idx.sort()
+        kept = [records[i] for i in keep_idx]
+
+        # The old checkpoint's offset means nothing in the rewritten log
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION))
+            f.write(b"".join(RECORD.pack(*rec) for rec in kept))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        print(f"Compacted price history: {len(records)} -> {len(kept)} records.")
+        self.index = {}
+        self._checkpoint = None
+        for rec in kept:
+            self._index_add(*rec)
+        self._file = open(self.path, "ab")
+        self.save_index()
+        return True
+    # --- End Compaction ---
+
+    def close(self):
+        if self._file and not self._file.closed:
+            self.save_index()
+            self._file.close()
@@ -1,31 +1,19 @@
+import os
 import re
+import sys
 import json
 import time
 import random
-import requests # <-- Import requests for Telegram
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
-from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium_stealth import stealth
-import gspread
-from google.oauth2.service_account import Credentials
-# --- Google Sheets Integration ---
-import gspread
-from google.oauth2.service_account import Credentials
-# --- End Google Sheets Integration ---
-
-# Only import 2Captcha if needed
-try:
-    from twocaptcha import TwoCaptcha
-except ImportError:
-    TwoCaptcha = None # Define it as None if library not installed
+import socket
+import argparse
+import importlib.util
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
+from deal_scoring import category_from_url
+
+# Heavy integrations (selenium, gspread/google-auth, requests, 2Captcha, numpy, aiohttp,
+# redis) are imported only when the feature that needs them actually runs, so a dry run,
+# `--check-startup` or importing this file as a library stays fast.
 
 # --- Configuration ---
 # --- TOGGLE FEATURES HERE ---
@@ -35,7 +23,53 @@ SEND_TO_GOOGLE_SHEETS = True # Set to True to send data to Google Sheets
 SEND_TELEGRAM_ALERTS = True # Set to True to send alerts via Telegram
 
 MAX_PAGES = 2 # Set a limit for the number of pages to scrape
-MIN_ALERT_DISCOUNT = 40 # Example: Only alert for 40% off or more
+MIN_ALERT_DISCOUNT = 40.0 # Example: Only alert for 40% off or more
+
+# --- Price History Config ---
+TRACK_PRICE_HISTORY = True # Set to True to record every observed price per style ID
+PRICE_HISTORY_FILE = '6pm_price_history.bin' # Append-only binary store (created if missing)
+PRICE_HISTORY_DAYS = 90 # Window used for "lowest price in N days" checks
+PRICE_HISTORY_MAX_MB = 16 # Compact the file once it grows past this size (also bounds the startup index load)
+# --- End Price History Config ---
+
+# --- Deal Scoring Config ---
+SCORE_DEALS = True # Set to True to score discounts against per-brand/category history (needs numpy)
+DEAL_HISTORY_FILE = '6pm_deal_history.npz' # Rolling history of observed discounts
+DEAL_HISTORY_DAYS = 30 # Only compare against discounts seen in the last N days
+MIN_DEAL_ZSCORE = 2.0 # Also alert when a discount is this many std devs above the brand's norm
+MIN_BRAND_HISTORY = 20 # ...but only once the brand has at least this many past observations
+MIN_DEAL_PERCENTILE = 95.0 # ...and the discount beats this percentage of the brand's recent deals
+MIN_SCORED_DISCOUNT = 20.0 # ...and is at least this many percent off in absolute terms
+# --- End Deal Scoring Config ---
+
+# --- De-duplication Config ---
+DEDUP_PRODUCTS = True # Skip products already processed this run and suppress repeat alerts across runs
+SEEN_FILTER_FILE = '6pm_seen_filter.bin' # Persisted Bloom filter (size is fixed by the capacity below)
+SEEN_FILTER_CAPACITY = 200000 # Items per filter generation before it rotates
+SKIP_SEEN_ACROSS_RUNS = False # Set to True to also skip products seen in earlier runs (stops price tracking for them)
+# --- End De-duplication Config ---
+
+# --- Product Enrichment Config ---
+ENRICH_ALERT_CANDIDATES = False # Set to True to fetch product pages (sizes/colors) for alert candidates (needs aiohttp)
+ENRICH_CACHE_DIR = '6pm_http_cache' # On-disk cache honoring ETag / Last-Modified / max-age
+ENRICH_CONCURRENCY = 8 # Max product pages fetched at once
+ENRICH_DEFAULT_MAX_AGE = 3600 # Seconds to treat a page as fresh when the server sends no max-age
+ENRICH_CACHE_MAX_DAYS = 14 # Drop cached pages not fetched or revalidated in this many days
+ENRICH_CACHE_MAX_MB = 100 # ...and the least recently validated ones beyond this size
+ENRICH_REQUIRE_IN_STOCK = True # Skip alerts for products whose page shows no sizes in stock
+# --- End Product Enrichment Config ---
+
+# --- Distributed Crawl Config ---
+# Used by --mode coordinator / --mode worker. A file path means a shared SQLite queue;
+# use a redis://host:6379/0 URL when workers run on several machines.
+WORK_QUEUE = '6pm_work_queue.sqlite'
+QUEUE_VISIBILITY_TIMEOUT = 600 # Seconds a worker holds a page before it's handed to someone else
+QUEUE_MAX_ATTEMPTS = 3 # Give up on a page after this many failed leases
+WORKER_IDLE_TIMEOUT = 60 # Workers exit after this long with nothing to lease
+QUEUE_ALERT_CLAIM_DAYS = 7 # Forget cross-worker alert claims older than this when a sweep starts
+# --- End Distributed Crawl Config ---
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
 
 # --- Google Sheets Config ---
 # Make sure credentials.json is in the same directory as the script
@@ -60,28 +94,91 @@ PROXY_HOST = "proxy.example.com" # Your proxy host
 PROXY_PORT = 8080 # Your proxy port
 PROXY_USER = "username" # Your proxy username, or None
 PROXY_PASS = "password" # Your proxy password, or None
+
+# --- Output / Startup Config ---
+SEARCH_URLS = [ # Search result pages to crawl (overridden by URLs given on the command line)
+    "https://www.6pm.com/womens/shoes/CK_XAcABAeICAgEY.zso?s=isNew%2Fdesc%2FgoLiveDate%2Fdesc%2FrecentSalesStyle%2Fdesc%2F",
+]
+OUTPUT_JSON_FILE = '6pm_products.json' # Where each run's scraped products are saved
+IMPORT_TIME_BUDGET_MS = 150 # --check-startup fails if importing this script takes longer
+# --- End Output / Startup Config ---
 # --- END TOGGLE FEATURES ---
 
-# Configure the proxy string only if USE_PROXY is True
-proxy_full_address = None
-if USE_PROXY:
-    proxy_auth = f"{PROXY_USER}:{PROXY_PASS}@" if PROXY_USER and PROXY_PASS else ""
-    proxy_full_address = f"http://{proxy_auth}{PROXY_HOST}:{PROXY_PORT}"
+# --- End Configuration ---
+
+# Snapshot of the defaults above; a config file / SIXPM_* env vars override them (see configure())
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '6pm_config.json') # Next to the script, not the CWD
+DEFAULT_SETTINGS = {name: value for name, value in globals().items() if name.isupper() and name != "CONFIG_FILE"}
+
+# Heavy modules that must never be imported just by loading this script
+LAZY_MODULES = ["selenium", "webdriver_manager", "selenium_stealth", "gspread", "google.oauth2", "twocaptcha", "requests", "numpy", "aiohttp", "redis"]
 
-# 2Captcha solver setup only if SOLVE_CAPTCHA is True
 captcha_solver = None
-if SOLVE_CAPTCHA:
-    if TwoCaptcha is None:
+
+
+def configure(config_file=None, overrides=None):
+    """
+    Applies settings from a JSON config file, SIXPM_* environment variables and
+    explicit overrides (in that order of priority) on top of the defaults above.
+    """
+    from config import load_settings
+    if config_file is None and os.path.exists(CONFIG_FILE):
+        config_file = CONFIG_FILE
+    settings = load_settings(DEFAULT_SETTINGS, path=config_file, overrides=overrides)
+    globals().update(settings)
+    return settings
+
+
+def is_placeholder(value):
+    """True for credentials still left empty or at their 'YOUR_...' template value."""
+    return not value or str(value).startswith("YOUR_")
+
+
+def proxy_address():
+    """Builds the proxy URL from the proxy settings, or None if proxies are disabled."""
+    if not USE_PROXY:
+        return None
+    proxy_auth = f"{PROXY_USER}:{PROXY_PASS}@" if PROXY_USER and PROXY_PASS else ""
+    return f"http://{proxy_auth}{PROXY_HOST}:{PROXY_PORT}"
+
+
+def setup_captcha_solver():
+    """Creates the 2Captcha client if SOLVE_CAPTCHA is on (only imports twocaptcha then)."""
+    global captcha_solver, SOLVE_CAPTCHA
+    if not SOLVE_CAPTCHA or captcha_solver is not None:
+        return captcha_solver
+    try:
+        from twocaptcha import TwoCaptcha
+    except ImportError:
         print("[ERROR] '2captcha-python' library is not installed. CAPTCHA solving disabled.")
         print("Please install it: pip install 2captcha-python")
         SOLVE_CAPTCHA = False # Force disable if library missing
-    elif 'YOUR_2CAPTCHA_API_KEY' in TWO_CAPTCHA_API_KEY:
+        return None
+    if is_placeholder(TWO_CAPTCHA_API_KEY):
          print("\n[WARNING] 2Captcha API Key is still the placeholder. CAPTCHA solving will fail.")
-         print("Please edit the script and add your API key.\n")
+         print("Please set TWO_CAPTCHA_API_KEY in the config file or SIXPM_TWO_CAPTCHA_API_KEY.\n")
          # Consider setting SOLVE_CAPTCHA = False here too, or let it fail later
     else:
         captcha_solver = TwoCaptcha(TWO_CAPTCHA_API_KEY)
-# --- End Configuration ---
+    return captcha_solver
+
+
+def load_selenium():
+    """Imports Selenium and friends on first use and binds them as module globals."""
+    global webdriver, Service, Options, By, WebDriverWait, EC, Keys, ChromeDriverManager, stealth
+    global TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
+    if "By" in globals():
+        return
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
+    from selenium.webdriver.common.keys import Keys
+    from webdriver_manager.chrome import ChromeDriverManager
+    from selenium_stealth import stealth
 
 
 # --- Google Sheets Functions ---
@@ -90,7 +187,11 @@ def authenticate_google_sheets():
     if not SEND_TO_GOOGLE_SHEETS:
         print("Google Sheets integration disabled.")
         return None, None
-    if 'YOUR_GOOGLE_SHEET_ID_HERE' in GOOGLE_SHEET_ID:
+    # --- Google Sheets Integration (imported only when Sheets is enabled) ---
+    import gspread
+    from google.oauth2.service_account import Credentials
+    # ---
+    if is_placeholder(GOOGLE_SHEET_ID):
          print("[ERROR] GOOGLE_SHEET_ID is not set in the script.")
          print("Please paste the Sheet ID from its URL into the GOOGLE_SHEET_ID variable.")
          return None, None
@@ -137,6 +238,7 @@ def send_data_to_google_sheet(sheet, data):
     if not sheet or not data:
         print("No sheet object or data provided, skipping Google Sheets update.")
         return
+    import gspread
 
     try:
         print(f"Attempting to send {len(data)} items to Google Sheets...")
@@ -207,13 +309,16 @@ def send_data_to_google_sheet(sheet, data):
 
 # --- Telegram Function ---
 def send_telegram_alert(deal_data):
-    """Sends a formatted deal alert to your Telegram chat."""
+    """Sends a formatted deal alert to your Telegram chat. Returns True if Telegram accepted it."""
     if not SEND_TELEGRAM_ALERTS:
          # print("Telegram alerts disabled.") # Keep console cleaner
-         return
-    if 'YOUR_BOT_TOKEN_HERE' in TELEGRAM_BOT_TOKEN or 'YOUR_CHAT_ID_HERE' in YOUR_CHAT_ID:
+         return False
+    if is_placeholder(TELEGRAM_BOT_TOKEN) or is_placeholder(YOUR_CHAT_ID):
         print("[WARN] Telegram token or chat ID not configured. Skipping alert.")
-        return
+        return False
+    import requests # Imported here so runs without Telegram alerts don't pay for it
+
+    api_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 
     # Helper function to escape MarkdownV2 characters
     def escape_markdown(text):
@@ -234,6 +339,14 @@ def send_telegram_alert(deal_data):
         # Format prices after escaping other text
         current_price_str = escape_markdown(f"{current_price_val:.2f}")
         original_price_str = escape_markdown(f"{original_price_val:.2f}")
+        # Extra line when price history says this is a genuine low, not just a big MSRP gap
+        history_line = ""
+        if deal_data.get("is_lowest_recent"):
+            history_line = escape_markdown(f"📉 Lowest price seen in {PRICE_HISTORY_DAYS} days") + "\n"
+        if deal_data.get("available_sizes"):
+            history_line += f"*Sizes:* {escape_markdown(', '.join(deal_data['available_sizes']))}\n"
+        if is_unusual_for_brand(deal_data):
+            history_line += escape_markdown(f"📊 Unusually good for this brand (better than {deal_data['brand_percentile']:.0f}% of recent deals)") + "\n"
 
         discount = int(deal_data.get("discount_percent", 0)) # Use int for cleaner look
         product_url = deal_data.get("product_url", "#") # Don't escape URLs, but ensure they don't contain unbalanced parentheses
@@ -248,7 +361,8 @@ def send_telegram_alert(deal_data):
             f"*{discount}% OFF* 🔥 Deal Found on 6pm\\!\n\n"
             f"*Brand:* {brand}\n"
             f"*Product:* {title}\n"
-            f"*Price:* *${current_price_str}* \\(was ${original_price_str}\\)\n\n"
+            f"*Price:* *${current_price_str}* \\(was ${original_price_str}\\)\n"
+            f"{history_line}\n"
             f"[View Product]({product_url})"
         )
 
@@ -266,12 +380,12 @@ def send_telegram_alert(deal_data):
         try:
             response = requests.post(api_url, json=payload, timeout=10)
             response.raise_for_status()
+            return True
         except requests.exceptions.RequestException as fallback_e:
             print(f"  [ERROR] Also failed sending plain text Telegram alert: {fallback_e}")
-        return # Exit after sending fallback
+            return False # Exit after sending fallback
 
     # --- Send the message via Telegram API ---
-    api_url = f"https://api.telegram.org/bot8454465574:AAG9MLFtIwbpPfvFRs06A-GbMsTOLkRDilE/sendMessage"
     payload = {
         'chat_id': YOUR_CHAT_ID,
         'text': message,
@@ -288,6 +402,7 @@ def send_telegram_alert(deal_data):
         response = requests.post(api_url, json=payload, timeout=10)
         response.raise_for_status() # Raise exception for bad status codes
         # Success message moved outside this function for cleaner scraping loop output
+        return True
     except requests.exceptions.RequestException as e:
         print(f"  [ERROR] Error sending Telegram alert: {e}")
         # --- DEBUG: Print response body on error ---
@@ -298,6 +413,7 @@ def send_telegram_alert(deal_data):
              except json.JSONDecodeError:
                  print(f"  [DEBUG] Telegram API Response (Text): {response.text}") # Print raw text if not JSON
         # --- END DEBUG ---
+        return False
 
 def calculate_discount(original_price, current_price):
     """Calculates discount percentage."""
@@ -306,6 +422,61 @@ def calculate_discount(original_price, current_price):
         return round(discount, 2)
     return 0.0
 
+def is_unusual_for_brand(product_info):
+    """True if the deal scorer flagged this discount as well above the brand's usual."""
+    brand_zscore = product_info.get("brand_zscore")
+    brand_percentile = product_info.get("brand_percentile")
+    return (
+        brand_zscore is not None
+        and brand_percentile is not None
+        and product_info["discount_percent"] >= MIN_SCORED_DISCOUNT
+        and product_info.get("brand_history_count", 0) >= MIN_BRAND_HISTORY
+        and brand_zscore >= MIN_DEAL_ZSCORE
+        and brand_percentile >= MIN_DEAL_PERCENTILE
+    )
+
+def is_alert_worthy(product_info):
+    """Alert rule: flat discount threshold, or unusually good for the brand."""
+    return product_info["discount_percent"] >= MIN_ALERT_DISCOUNT or is_unusual_for_brand(product_info)
+
+def alert_key_for(product_info):
+    """Seen-filter key for an alert: same style at the same price counts as a duplicate."""
+    return f"alert:{product_info['style_id']}:{int(round(product_info['current_price'] * 100))}"
+
+def write_or_stage(integrations, write, *args, **kwargs):
+    """
+    Applies a history write (price sighting, discount batch) now, or, while a queue
+    worker's page is in flight, holds it until the page's result is committed.
+    """
+    staged = integrations.get("staged_writes")
+    if staged is None:
+        write(*args, **kwargs)
+    else:
+        staged.append((write, args, kwargs))
+
+def score_page_deals(integrations, page_products, category):
+    """Scores one page of products in a single vectorized pass and annotates them in place."""
+    deal_scorer = integrations.get("deal_scorer")
+    if not deal_scorer or not page_products:
+        return
+    brands = [p["brand"] for p in page_products]
+    categories = [category] * len(page_products)
+    discounts = [p["discount_percent"] for p in page_products]
+    try:
+        scores = deal_scorer.score_batch(brands, categories, discounts)
+        for i, product_info in enumerate(page_products):
+            if scores["brand_n"][i] > 0:
+                product_info["brand_zscore"] = round(float(scores["brand_z"][i]), 2)
+                product_info["brand_percentile"] = round(float(scores["brand_pct"][i]), 1)
+            product_info["brand_history_count"] = int(scores["brand_n"][i])
+            if scores["category_n"][i] > 0:
+                product_info["category_zscore"] = round(float(scores["category_z"][i]), 2)
+                product_info["category_percentile"] = round(float(scores["category_pct"][i]), 1)
+        # Add the page to history only after scoring so items aren't compared to themselves
+        write_or_stage(integrations, deal_scorer.add_batch, brands, categories, discounts, ts=int(time.time()))
+    except Exception as e:
+        print(f"  [ERROR] Deal scoring failed for this page: {e}")
+
 def parse_price(price_text):
     """Extracts float value from price string (removes $, commas)."""
     if not price_text:
@@ -420,21 +591,19 @@ def solve_captcha_if_present(driver):
 
 
 
-def scrape_6pm(url, sheet): # Added sheet parameter
-    """
-    Scrapes product data from multiple pages of a 6pm.com search results.
-    Sends data to Google Sheets and Telegram if configured.
-    """
-    # ... (Setup code remains the same) ...
+def create_driver():
+    """Starts a stealth Chrome session with the configured options and proxy."""
+    load_selenium()
+    setup_captcha_solver()
+    proxy_full_address = proxy_address()
+
     options = Options()
     # options.add_argument("--headless") # Keep headless commented out for debugging
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("start-maximized")
     options.add_argument("--window-size=1920,1080")
-    options.add_argument(
-        "user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
-    )
+    options.add_argument(f"user-agent={BROWSER_USER_AGENT}")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
@@ -449,18 +618,420 @@ def scrape_6pm(url, sheet): # Added sheet parameter
         print("Proxy usage is disabled.")
     # ---
 
+    service = Service(ChromeDriverManager().install())
+    driver = webdriver.Chrome(service=service, options=options)
+
+    # --- Apply selenium-stealth ---
+    stealth(driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Linux x86_64", webgl_vendor="Intel Inc.", renderer="Intel Iris OpenGL Engine", fix_hairline=True)
+    # ---
+    return driver
+
+
+def worker_state_file(path, worker_id=None):
+    """Per-worker name for a local state file: '6pm_seen.bloom' -> '6pm_seen.<worker id>.bloom'."""
+    if not worker_id:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)}{ext}"
+
+
+def open_integrations(worker_id=None):
+    """
+    Opens the local stores (price history, deal scoring, seen filter) enabled in the config.
+    With a worker_id each store uses its own file (see worker_state_file): these stores are
+    rewritten whole on close, so processes must never share one.
+    """
+    integrations = {"price_history": None, "deal_scorer": None, "seen_filter": None, "enricher": None}
+    price_history_file = worker_state_file(PRICE_HISTORY_FILE, worker_id)
+    deal_history_file = worker_state_file(DEAL_HISTORY_FILE, worker_id)
+    seen_filter_file = worker_state_file(SEEN_FILTER_FILE, worker_id)
+
+    # --- Open Price History Store ---
+    if TRACK_PRICE_HISTORY:
+        from price_history import PriceHistoryStore
+        try:
+            integrations["price_history"] = PriceHistoryStore(
+                price_history_file,
+                retention_days=PRICE_HISTORY_DAYS,
+                max_bytes=PRICE_HISTORY_MAX_MB * 1024 * 1024,
+            )
+            print(f"Price history loaded: {len(integrations['price_history'].index)} products tracked.")
+        except Exception as ph_e:
+            print(f"[ERROR] Failed to open price history '{price_history_file}': {ph_e}. Continuing without it.")
+    # ---
+
+    # --- Load Deal Scoring History ---
+    if SCORE_DEALS:
+        from deal_scoring import DealScorer
+        try:
+            integrations["deal_scorer"] = DealScorer(deal_history_file, history_days=DEAL_HISTORY_DAYS)
+            print(f"Deal history loaded: {len(integrations['deal_scorer'].discounts)} recent observations.")
+        except ImportError as ds_e:
+            print(f"[ERROR] {ds_e}. Deal scoring disabled.")
+        except Exception as ds_e:
+            print(f"[ERROR] Failed to load deal history '{deal_history_file}': {ds_e}. Continuing without it.")
+    # ---
+
+    # --- Load De-duplication Filter ---
+    if DEDUP_PRODUCTS:
+        from dedup import SeenFilter
+        try:
+            integrations["seen_filter"] = SeenFilter(seen_filter_file, capacity=SEEN_FILTER_CAPACITY)
+        except Exception as sf_e:
+            print(f"[ERROR] Failed to load seen filter '{seen_filter_file}': {sf_e}. Continuing without de-duplication.")
+    # ---
+
+    # --- Start Product Enricher (one HTTP session for the whole run) ---
+    if ENRICH_ALERT_CANDIDATES:
+        try:
+            from enrichment import ProductEnricher
+            integrations["enricher"] = ProductEnricher(
+                ENRICH_CACHE_DIR,
+                concurrency=ENRICH_CONCURRENCY,
+                user_agent=BROWSER_USER_AGENT,
+                default_max_age=ENRICH_DEFAULT_MAX_AGE,
+                cache_max_age=ENRICH_CACHE_MAX_DAYS * 86400,
+                cache_max_bytes=ENRICH_CACHE_MAX_MB * 1024 * 1024,
+            )
+        except ImportError as en_e:
+            print(f"[ERROR] {en_e}. Enrichment disabled.")
+        except Exception as en_e:
+            print(f"[ERROR] Failed to set up enrichment: {en_e}. Continuing without it.")
+    # ---
+
+    return integrations
+
+
+def close_integrations(integrations):
+    """Saves and closes whatever open_integrations() opened."""
+    seen_filter = integrations.get("seen_filter")
+    deal_scorer = integrations.get("deal_scorer")
+    price_history = integrations.get("price_history")
+    enricher = integrations.get("enricher")
+    if enricher:
+        try:
+            pruned = enricher.close()
+            if pruned:
+                print(f"Pruned {pruned} stale HTTP cache entries.")
+        except Exception as en_e:
+            print(f"[ERROR] Failed to close enrichment session: {en_e}")
+    if seen_filter:
+        print(seen_filter.stats_line())
+        try:
+            seen_filter.save()
+        except Exception as sf_e:
+            print(f"[ERROR] Failed to save seen filter: {sf_e}")
+    if deal_scorer:
+        try:
+            deal_scorer.save()
+        except Exception as ds_e:
+            print(f"[ERROR] Failed to save deal history: {ds_e}")
+    if price_history:
+        try:
+            price_history.compact_if_needed()
+            price_history.close()
+        except Exception as ph_e:
+            print(f"[ERROR] Failed to compact/close price history: {ph_e}")
+
+
+def wait_for_product_grid(driver, current_page):
+    """
+    Waits for the product grid (retrying once after a CAPTCHA check).
+    Returns True if the page has products to scrape, None if 6pm says there are
+    no results, and False if the page failed to load (timeout/crash).
+    """
+    # Wait for the product grid marker (using the article element)
+    wait_time = 60 if SOLVE_CAPTCHA else 30 # Wait longer if we might need to solve CAPTCHA
+    print(f"Waiting for product grid to load (max {wait_time} seconds)...")
+    try:
+        WebDriverWait(driver, wait_time).until(
+            # Wait for first product OR the "no results" message to be sure page loaded
+            EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-style-id], div._-z")) # Added selector for no results div
+        )
+        print("Product grid or 'no results' found.")
+    except TimeoutException:
+        print("Timeout waiting for product grid. Checking for CAPTCHA again...")
+        if solve_captcha_if_present(driver):
+            print("CAPTCHA possibly handled. Retrying wait...")
+            try:
+                WebDriverWait(driver, 20).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-style-id], div._-z"))
+                )
+                print("Product grid or 'no results' found after CAPTCHA solve.")
+            except TimeoutException:
+                print("\n--- SCRAPE FAILED (Page {current_page}) ---")
+                print("Still timed out after attempting CAPTCHA solve.")
+                driver.save_screenshot(f"debug_6pm_timeout_p{current_page}.png")
+                print("Saved screenshot.")
+                return False # Stop scraping on persistent timeout
+        else:
+            print("\n--- SCRAPE FAILED (Page {current_page}) ---")
+            print("Page timed out, no CAPTCHA found or solved. Site might be blocking or layout changed.")
+            driver.save_screenshot(f"debug_6pm_timeout_p{current_page}.png")
+            print("Saved screenshot.")
+            return False # Stop scraping on timeout
+    # --- Selenium session error often occurs around here due to bot detection ---
+    except WebDriverException as e:
+         if "invalid session id" in str(e) or "disconnected" in str(e):
+              print(f"\n--- BROWSER CRASHED (Page {current_page}) ---")
+              print("Error: ", str(e))
+              print("This often indicates aggressive bot detection closing the browser.")
+              print("Consider using a residential proxy (USE_PROXY=True) or enabling CAPTCHA solving.")
+         else:
+              print(f"An unexpected WebDriverException occurred: {e}") # Handle other WebDriver errors
+         return False # Stop scraping if browser connection is lost
+
+
+    # Check if the "no results" message is present
+    try:
+        no_results = driver.find_element(By.CSS_SELECTOR, "div._-z") # Specific selector for "no results found" container
+        if "no results found" in no_results.text.lower():
+             print("'No results found' message detected. Stopping pagination.")
+             return None
+    except NoSuchElementException:
+         pass # No "no results" message, proceed
+    return True
+
+
+def scrape_current_page(driver, current_page, integrations, heartbeat=None):
+    """
+    Extracts every product on the currently loaded results page and returns them as dicts.
+    heartbeat, if given, is called every 20 products (queue workers use it to extend their lease).
+    """
+    price_history = integrations.get("price_history")
+    seen_filter = integrations.get("seen_filter")
+
+    # --- Scrolling (Optional, might not be needed if products load instantly) ---
+    print("Scrolling page (optional)...")
+    body = driver.find_element(By.TAG_NAME, 'body')
+    scrolls_done = 0
+    while scrolls_done < 3: # Fewer scrolls per page might be enough
+        body.send_keys(Keys.PAGE_DOWN)
+        time.sleep(random.uniform(0.8, 1.5))
+        scrolls_done += 1
+    print("Scrolling finished.")
+    # --- End Scrolling ---
+
+    # --- Find Products ---
+    product_containers = driver.find_elements(By.CSS_SELECTOR, "article[data-style-id]")
+    print(f"Found {len(product_containers)} product containers on page {current_page}.")
+
+    if not product_containers:
+        # If grid was found but no containers, something is odd
+        print(f"[WARN] No product containers found on page {current_page}, but grid seemed present.")
+
+    # --- Loop through products ---
+    scraped_this_page = 0
+    page_products = []
+    for position, item in enumerate(product_containers):
+        # Outside the per-item try below, so a lost lease stops the page instead of being logged
+        if heartbeat and position and position % 20 == 0:
+            heartbeat()
+        # --- De-duplicate on style ID before any per-field extraction ---
+        try:
+            style_id = item.get_attribute("data-style-id")
+        except StaleElementReferenceException:
+            print("  [WARN] Stale element detected, likely due to page update. Skipping item.")
+            continue
+        if seen_filter and style_id:
+            if seen_filter.seen_in_run(style_id):
+                continue # Same product already scraped from another page/URL this run
+            if seen_filter.seen_before(f"style:{style_id}"):
+                if SKIP_SEEN_ACROSS_RUNS:
+                    continue
+            else:
+                seen_filter.remember(f"style:{style_id}")
+        # ---
+
+        time.sleep(random.uniform(0.1, 0.4)) # Small delay between scraping items
+
+        product_info = {
+            "style_id": style_id,
+            "brand": "N/A", # Moved brand first to match Sheets order likely
+            "title": "N/A",
+            "current_price": 0.0,
+            "original_price": 0.0,
+            "discount_percent": 0.0,
+            "product_url": "N/A",
+            "image_url": "N/A",
+            "site_url": "www.6pm.com",
+        }
+
+
+        try:
+            # --- Get URL ---
+            link_element = item.find_element(By.CSS_SELECTOR, "a.NR-z") # Use the link inside the details div
+            href = link_element.get_attribute('href')
+            if href:
+                 product_info["product_url"] = href if href.startswith("http") else f"https://www.6pm.com{href}"
+
+            # --- Get Brand ---
+            try:
+                brand_element = item.find_element(By.CSS_SELECTOR, "dd.OR-z span")
+                product_info["brand"] = brand_element.text.strip()
+            except NoSuchElementException:
+                print(f"  [WARN] Brand element not found.")
+
+            # --- Get Title ---
+            try:
+                title_element = item.find_element(By.CSS_SELECTOR, "dd.PR-z")
+                product_info["title"] = title_element.text.strip()
+            except NoSuchElementException:
+                 print(f"  [WARN] Title element not found.")
+
+            # --- Get Image URL ---
+            try:
+                # Prefer the first image in the figure
+                img_element = item.find_element(By.CSS_SELECTOR, "figure img.Jn-z")
+                product_info["image_url"] = img_element.get_attribute('src')
+            except NoSuchElementException:
+                print(f"  [WARN] Image not found.")
+
+            # --- Get Prices ---
+            try:
+                # Current (sale) price
+                current_price_element = item.find_element(By.CSS_SELECTOR, "span.c--z")
+                product_info["current_price"] = parse_price(current_price_element.text)
+            except NoSuchElementException:
+                 print(f"  [WARN] Current price not found.")
+
+            try:
+                # Original (standard/MSRP) price
+                original_price_element = item.find_element(By.CSS_SELECTOR, "span.g--z")
+                product_info["original_price"] = parse_price(original_price_element.text)
+            except NoSuchElementException:
+                # If no original price, assume it's the same as current
+                product_info["original_price"] = product_info["current_price"]
+                # print(f"  [INFO] Original price span not found, using current price.") # Less verbose
+
+            # --- Calculate Discount ---
+            product_info["discount_percent"] = calculate_discount(
+                product_info["original_price"],
+                product_info["current_price"]
+            )
+
+            # --- Record Price History ---
+            if price_history and product_info["style_id"] and product_info["current_price"] > 0:
+                # Query before recording so the current sighting isn't compared to itself
+                product_info["is_lowest_recent"] = price_history.is_lowest_in(
+                    product_info["style_id"], product_info["current_price"], days=PRICE_HISTORY_DAYS
+                )
+                write_or_stage(
+                    integrations, price_history.record,
+                    product_info["style_id"], product_info["current_price"], ts=int(time.time()),
+                )
+            # ---
+
+            page_products.append(product_info)
+            scraped_this_page += 1
+
+            # Less verbose success message
+            if scraped_this_page % 20 == 0 or scraped_this_page == len(product_containers):
+                print(f"  Scraped {scraped_this_page}/{len(product_containers)} items on page {current_page}...")
+
+        except StaleElementReferenceException:
+            print("  [WARN] Stale element detected, likely due to page update. Skipping item.")
+            continue # Skip this item and continue loop
+        except Exception as e:
+            print(f"  [ERROR] Failed to scrape details for one item on page {current_page}. Error: {e}")
+
+    # --- End product loop for current page ---
+    return page_products
+
+
+def send_page_alerts(page_products, current_page, integrations, category, claim_alert=None, release_alert=None):
+    """
+    Scores a page of products, enriches alert candidates and sends Telegram alerts.
+    claim_alert, if given, is called with each alert key and must return True before
+    the alert is sent (used to stop several workers alerting on the same deal);
+    release_alert gives the claim back when the send fails.
+    Returns the number of alerts sent.
+    """
+    seen_filter = integrations.get("seen_filter")
+    alerts_sent = 0
+
+    # --- Score the page as one batch, then check and send Telegram alerts ---
+    score_page_deals(integrations, page_products, category)
+    alert_candidates = []
+    for product_info in page_products:
+        if SEND_TELEGRAM_ALERTS and is_alert_worthy(product_info):
+             # Same style at the same price was already alerted in an earlier run
+             if seen_filter and product_info["style_id"] and seen_filter.alert_already_sent(alert_key_for(product_info)):
+                 continue
+             alert_candidates.append(product_info)
+
+    # --- Enrich alert candidates with product-page details (sizes/colors) ---
+    enricher = integrations.get("enricher")
+    if enricher and alert_candidates:
+        try:
+            enrich_stats = enricher.enrich(alert_candidates)
+            print(f"  {enrich_stats.summary()}")
+        except Exception as en_e:
+            print(f"  [ERROR] Enrichment failed for page {current_page}: {en_e}")
+    # ---
+
+    for product_info in alert_candidates:
+        if ENRICH_REQUIRE_IN_STOCK and product_info.get("in_stock") is False:
+            print(f"  [INFO] Skipping alert for '{product_info['title']}': no sizes in stock.")
+            continue
+        if claim_alert and not claim_alert(alert_key_for(product_info)):
+            print(f"  [INFO] Alert for '{product_info['title']}' already sent by another worker.")
+            continue
+        print(f"  >>> Deal Alert! ({product_info['discount_percent']}% off) Sending Telegram message for '{product_info['title']}'...")
+        # Note: Success/Error message is now inside send_telegram_alert for debugging
+        if send_telegram_alert(product_info):
+            # Only a delivered alert counts as sent, so a failed one is retried next run
+            if seen_filter and product_info["style_id"]:
+                seen_filter.remember(alert_key_for(product_info))
+            alerts_sent += 1
+        elif claim_alert and release_alert:
+            release_alert(alert_key_for(product_info))
+        time.sleep(1) # Small pause after sending alert
+    # --- End Telegram Alert Check ---
+    return alerts_sent
+
+
+def save_results(all_products_data, sheet):
+    """Writes the combined results to OUTPUT_JSON_FILE and, if enabled, to Google Sheets."""
+    # --- Save to JSON (optional) ---
+    if all_products_data:
+        output_file = OUTPUT_JSON_FILE
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(all_products_data, f, indent=4, ensure_ascii=False)
+            print(f"Data for {len(all_products_data)} products saved to {output_file}")
+        except Exception as e:
+            print(f"[ERROR] Failed to save data to JSON file '{output_file}': {e}")
+    else:
+        print("\nScraping finished, but no product data was collected.")
+    # --- End Save to JSON ---
+
+    # --- Send to Google Sheets (if enabled and data exists) ---
+    if SEND_TO_GOOGLE_SHEETS and all_products_data and sheet:
+        send_data_to_google_sheet(sheet, all_products_data)
+    elif SEND_TO_GOOGLE_SHEETS and not all_products_data:
+         print("No data scraped, skipping Google Sheets update.")
+    elif SEND_TO_GOOGLE_SHEETS and not sheet:
+         print("Google Sheet connection failed earlier, skipping update.")
+    # --- End Send to Google Sheets ---
+
+
+def scrape_6pm(url, integrations):
+    """
+    Scrapes product data from multiple pages of a 6pm.com search results and sends
+    Telegram alerts if configured. `integrations` comes from open_integrations() and
+    is shared across URLs so de-duplication spans the whole run.
+    Returns the list of scraped products (saving them is up to the caller).
+    """
     driver = None
     all_products_data = [] # List to hold data from all pages
     current_page = 1
     alerts_sent_this_run = 0
+    category = category_from_url(url)
+    load_selenium() # Needed before the try: its except clauses name Selenium exceptions
 
     try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-
-        # --- Apply selenium-stealth ---
-        stealth(driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Linux x86_64", webgl_vendor="Intel Inc.", renderer="Intel Iris OpenGL Engine", fix_hairline=True)
-        # ---
+        driver = create_driver()
 
         driver.get(url)
 
@@ -475,168 +1046,13 @@ def scrape_6pm(url, sheet): # Added sheet parameter
         while current_page <= MAX_PAGES:
             print(f"\n--- Scraping Page {current_page} ---")
 
-            # Wait for the product grid marker (using the article element)
-            wait_time = 60 if SOLVE_CAPTCHA else 30 # Wait longer if we might need to solve CAPTCHA
-            print(f"Waiting for product grid to load (max {wait_time} seconds)...")
-            try:
-                WebDriverWait(driver, wait_time).until(
-                    # Wait for first product OR the "no results" message to be sure page loaded
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-style-id], div._-z")) # Added selector for no results div
-                )
-                print("Product grid or 'no results' found.")
-            except TimeoutException:
-                print("Timeout waiting for product grid. Checking for CAPTCHA again...")
-                if solve_captcha_if_present(driver):
-                    print("CAPTCHA possibly handled. Retrying wait...")
-                    try:
-                        WebDriverWait(driver, 20).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, "article[data-style-id], div._-z"))
-                        )
-                        print("Product grid or 'no results' found after CAPTCHA solve.")
-                    except TimeoutException:
-                        print("\n--- SCRAPE FAILED (Page {current_page}) ---")
-                        print("Still timed out after attempting CAPTCHA solve.")
-                        driver.save_screenshot(f"debug_6pm_timeout_p{current_page}.png")
-                        print("Saved screenshot.")
-                        break # Stop scraping on persistent timeout
-                else:
-                    print("\n--- SCRAPE FAILED (Page {current_page}) ---")
-                    print("Page timed out, no CAPTCHA found or solved. Site might be blocking or layout changed.")
-                    driver.save_screenshot(f"debug_6pm_timeout_p{current_page}.png")
-                    print("Saved screenshot.")
-                    break # Stop scraping on timeout
-            # --- Selenium session error often occurs around here due to bot detection ---
-            except WebDriverException as e:
-                 if "invalid session id" in str(e) or "disconnected" in str(e):
-                      print(f"\n--- BROWSER CRASHED (Page {current_page}) ---")
-                      print("Error: ", str(e))
-                      print("This often indicates aggressive bot detection closing the browser.")
-                      print("Consider using a residential proxy (USE_PROXY=True) or enabling CAPTCHA solving.")
-                 else:
-                      print(f"An unexpected WebDriverException occurred: {e}") # Handle other WebDriver errors
-                 break # Stop scraping if browser connection is lost
-
-
-            # Check if the "no results" message is present
-            try:
-                no_results = driver.find_element(By.CSS_SELECTOR, "div._-z") # Specific selector for "no results found" container
-                if "no results found" in no_results.text.lower():
-                     print("'No results found' message detected. Stopping pagination.")
-                     break
-            except NoSuchElementException:
-                 pass # No "no results" message, proceed
-
-            # --- Scrolling (Optional, might not be needed if products load instantly) ---
-            print("Scrolling page (optional)...")
-            body = driver.find_element(By.TAG_NAME, 'body')
-            scrolls_done = 0
-            while scrolls_done < 3: # Fewer scrolls per page might be enough
-                body.send_keys(Keys.PAGE_DOWN)
-                time.sleep(random.uniform(0.8, 1.5))
-                scrolls_done += 1
-            print("Scrolling finished.")
-            # --- End Scrolling ---
-
-            # --- Find Products ---
-            product_containers = driver.find_elements(By.CSS_SELECTOR, "article[data-style-id]")
-            print(f"Found {len(product_containers)} product containers on page {current_page}.")
-
-            if not product_containers:
-                # If grid was found but no containers, something is odd
-                print(f"[WARN] No product containers found on page {current_page}, but grid seemed present.")
-
-            # --- Loop through products ---
-            scraped_this_page = 0
-            for item in product_containers:
-                time.sleep(random.uniform(0.1, 0.4)) # Small delay between scraping items
-
-                product_info = {
-                    "brand": "N/A", # Moved brand first to match Sheets order likely
-                    "title": "N/A",
-                    "current_price": 0.0,
-                    "original_price": 0.0,
-                    "discount_percent": 0.0,
-                    "product_url": "N/A",
-                    "image_url": "N/A",
-                    "site_url": "www.6pm.com",
-                }
+            if not wait_for_product_grid(driver, current_page):
+                break
 
+            page_products = scrape_current_page(driver, current_page, integrations)
+            all_products_data.extend(page_products)
+            alerts_sent_this_run += send_page_alerts(page_products, current_page, integrations, category)
 
-                try:
-                    # --- Get URL ---
-                    link_element = item.find_element(By.CSS_SELECTOR, "a.NR-z") # Use the link inside the details div
-                    href = link_element.get_attribute('href')
-                    if href:
-                         product_info["product_url"] = href if href.startswith("http") else f"https://www.6pm.com{href}"
-
-                    # --- Get Brand ---
-                    try:
-                        brand_element = item.find_element(By.CSS_SELECTOR, "dd.OR-z span")
-                        product_info["brand"] = brand_element.text.strip()
-                    except NoSuchElementException:
-                        print(f"  [WARN] Brand element not found.")
-
-                    # --- Get Title ---
-                    try:
-                        title_element = item.find_element(By.CSS_SELECTOR, "dd.PR-z")
-                        product_info["title"] = title_element.text.strip()
-                    except NoSuchElementException:
-                         print(f"  [WARN] Title element not found.")
-
-                    # --- Get Image URL ---
-                    try:
-                        # Prefer the first image in the figure
-                        img_element = item.find_element(By.CSS_SELECTOR, "figure img.Jn-z")
-                        product_info["image_url"] = img_element.get_attribute('src')
-                    except NoSuchElementException:
-                        print(f"  [WARN] Image not found.")
-
-                    # --- Get Prices ---
-                    try:
-                        # Current (sale) price
-                        current_price_element = item.find_element(By.CSS_SELECTOR, "span.c--z")
-                        product_info["current_price"] = parse_price(current_price_element.text)
-                    except NoSuchElementException:
-                         print(f"  [WARN] Current price not found.")
-
-                    try:
-                        # Original (standard/MSRP) price
-                        original_price_element = item.find_element(By.CSS_SELECTOR, "span.g--z")
-                        product_info["original_price"] = parse_price(original_price_element.text)
-                    except NoSuchElementException:
-                        # If no original price, assume it's the same as current
-                        product_info["original_price"] = product_info["current_price"]
-                        # print(f"  [INFO] Original price span not found, using current price.") # Less verbose
-
-                    # --- Calculate Discount ---
-                    product_info["discount_percent"] = calculate_discount(
-                        product_info["original_price"],
-                        product_info["current_price"]
-                    )
-
-                    all_products_data.append(product_info)
-                    scraped_this_page += 1
-
-                    # --- Check and Send Telegram Alert ---
-                    if SEND_TELEGRAM_ALERTS and product_info["discount_percent"] >= MIN_ALERT_DISCOUNT:
-                         print(f"  >>> Deal Alert! ({product_info['discount_percent']}% off) Sending Telegram message for '{product_info['title']}'...")
-                         send_telegram_alert(product_info)
-                         # Note: Success/Error message is now inside send_telegram_alert for debugging
-                         alerts_sent_this_run += 1
-                         time.sleep(1) # Small pause after sending alert
-                    # --- End Telegram Alert Check ---
-
-                    # Less verbose success message
-                    if scraped_this_page % 20 == 0 or scraped_this_page == len(product_containers):
-                        print(f"  Scraped {scraped_this_page}/{len(product_containers)} items on page {current_page}...")
-
-                except StaleElementReferenceException:
-                    print("  [WARN] Stale element detected, likely due to page update. Skipping item.")
-                    continue # Skip this item and continue loop
-                except Exception as e:
-                    print(f"  [ERROR] Failed to scrape details for one item on page {current_page}. Error: {e}")
-
-            # --- End product loop for current page ---
             print(f"Finished scraping page {current_page}. Total items so far: {len(all_products_data)}")
 
             # --- Find and click next page ---
@@ -675,36 +1091,16 @@ def scrape_6pm(url, sheet): # Added sheet parameter
 
         # --- End page loop ---
 
-        # --- Save to JSON (optional) ---
         if all_products_data:
-            output_file = "6pm_products.json"
-            try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(all_products_data, f, indent=4, ensure_ascii=False)
-                # Use current_page - 1 because current_page increments *before* the check/break
-                page_count_str = f"{current_page - 1 if current_page > 1 else 1}"
-                print(f"\nSuccessfully scraped {len(all_products_data)} products across {page_count_str} page(s).")
-                print(f"Data saved to {output_file}")
-                print(f"Sent {alerts_sent_this_run} Telegram alerts for deals >= {MIN_ALERT_DISCOUNT}% off.")
-            except Exception as e:
-                print(f"[ERROR] Failed to save data to JSON file '{output_file}': {e}")
+            print(f"\nSuccessfully scraped {len(all_products_data)} products across {current_page} page(s) of {url}.")
+            print(f"Sent {alerts_sent_this_run} Telegram alerts for deals >= {MIN_ALERT_DISCOUNT:g}% off or unusually good for their brand.")
         else:
-            print("\nScraping finished, but no product data was collected.")
+            print(f"\nNo product data was collected from {url}.")
             if driver:
                 try:
                     driver.save_screenshot("debug_6pm_no_data_final.png")
                     print("Saved screenshot.")
                 except: pass
-        # --- End Save to JSON ---
-
-        # --- Send to Google Sheets (if enabled and data exists) ---
-        if SEND_TO_GOOGLE_SHEETS and all_products_data and sheet:
-            send_data_to_google_sheet(sheet, all_products_data)
-        elif SEND_TO_GOOGLE_SHEETS and not all_products_data:
-             print("No data scraped, skipping Google Sheets update.")
-        elif SEND_TO_GOOGLE_SHEETS and not sheet:
-             print("Google Sheet connection failed earlier, skipping update.")
-        # --- End Send to Google Sheets ---
 
 
     except WebDriverException as e: # Catch WebDriverException specifically
@@ -737,45 +1133,305 @@ def scrape_6pm(url, sheet): # Added sheet parameter
             except Exception as quit_e:
                  print(f"Error while quitting driver: {quit_e}") # Catch errors during quit too
         print("Scraping complete. Browser closed.")
+    return all_products_data
 
 
-if __name__ == "__main__":
-    # Example search URL on 6pm.com for women's shoes
-    SEARCH_URL = "https://www.6pm.com/womens/shoes/CK_XAcABAeICAgEY.zso?s=isNew%2Fdesc%2FgoLiveDate%2Fdesc%2FrecentSalesStyle%2Fdesc%2F"
+# --- Distributed Crawl (coordinator / worker) ---
+def page_url(seed_url, page_index):
+    """URL of a results page: index 0 is the seed itself, index N carries p=N (shown as page N+1)."""
+    if page_index == 0:
+        return seed_url
+    parts = urlparse(seed_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "p"]
+    query.append(("p", str(page_index)))
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+def new_sweep_id():
+    """Identifies one coordinator run; task keys and results are namespaced by it."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+def page_task_key(sweep_id, seed_url, page_index):
+    return f"{sweep_id}/{seed_url}#p{page_index}"
+
+def has_next_page_link(driver, next_page_index):
+    """True if the pagination bar links to the results page with p=next_page_index."""
+    try:
+        WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "span.ro-z")))
+        pagination_container = driver.find_element(By.CSS_SELECTOR, "span.ro-z")
+        pagination_container.find_element(By.CSS_SELECTOR, f"a[href*='&p={next_page_index}']")
+        return True
+    except (TimeoutException, NoSuchElementException):
+        return False
+
+def run_coordinator(queue, seed_urls, sheet, wait=True):
+    """
+    Seeds the queue with the first page of each search URL, then (if wait) tracks
+    progress until workers drain it and publishes the combined results.
+    Workers discover and enqueue later pages themselves, up to MAX_PAGES.
+    Each run is a new sweep, so pages finished in earlier runs are crawled again
+    and only this sweep's results are published.
+    """
+    sweep_id = new_sweep_id()
+    purged = queue.purge(keep_prefix=f"{sweep_id}/", alert_max_age=QUEUE_ALERT_CLAIM_DAYS * 86400)
+    if purged:
+        print(f"Cleared {purged} finished task(s) from earlier sweeps.")
+    print(f"Starting sweep {sweep_id}")
+    for seed_url in seed_urls:
+        added = queue.enqueue(page_task_key(sweep_id, seed_url, 0), {"sweep": sweep_id, "seed": seed_url, "page": 0})
+        print(f"{'Queued' if added else 'Already queued'}: {seed_url}")
+    if not wait:
+        return
+
+    last_counts = None
+    while True:
+        counts = queue.counts()
+        if counts != last_counts:
+            print(f"Queue: {counts['pending']} pending, {counts['leased']} in progress, {counts['done']} done, {counts['failed']} failed")
+            last_counts = counts
+        if counts["pending"] == 0 and counts["leased"] == 0:
+            break
+        time.sleep(5)
+
+    # Results are committed once per page, so a product can only repeat across searches
+    all_products_data = []
+    seen_style_ids = set()
+    results = queue.results(prefix=f"{sweep_id}/")
+    for key, result in sorted(results.items()):
+        for product_info in result.get("products", []):
+            if product_info.get("style_id") and product_info["style_id"] in seen_style_ids:
+                continue
+            seen_style_ids.add(product_info.get("style_id"))
+            all_products_data.append(product_info)
+
+    print(f"\nSweep {sweep_id}: collected {len(all_products_data)} products from {len(results)} page(s).")
+    save_results(all_products_data, sheet)
+
+def run_queue_worker(queue, worker_id):
+    """
+    Leases result pages from the shared queue and scrapes them until the queue is drained.
+    Local history files are kept per worker_id, so give each worker on a host its own ID.
+    """
+    from work_queue import LeaseLost, run_worker
+    load_selenium()
+    state = {"driver": None}
+    integrations = open_integrations(worker_id)
+
+    seen_filter = integrations.get("seen_filter")
+
+    def handle_task(task):
+        sweep_id, seed_url, page_index = task.payload["sweep"], task.payload["seed"], task.payload["page"]
+        current_page = page_index + 1 # 1-based, for log messages
+        print(f"\n--- [{worker_id}] Scraping page {current_page} of {seed_url} (attempt {task.attempts}) ---")
+
+        def heartbeat():
+            # Keep the lease alive on slow pages; stop if it already went to another worker
+            if not queue.extend(task):
+                raise LeaseLost(f"lease on '{task.key}' expired and was handed to another worker")
+
+        # Everything this page writes is held back until the queue commits it (see after_task)
+        if seen_filter:
+            seen_filter.begin_page()
+        integrations["staged_writes"] = []
+        try:
+            if state["driver"] is None:
+                state["driver"] = create_driver()
+            driver = state["driver"]
+            driver.get(page_url(seed_url, page_index))
+            time.sleep(random.uniform(3.0, 5.0)) # Wait for navigation and initial load
+            solve_captcha_if_present(driver)
+
+            grid = wait_for_product_grid(driver, current_page)
+            if grid is None:
+                return {"seed": seed_url, "page": page_index, "products": []}
+            if grid is False:
+                raise RuntimeError("product grid did not load")
+
+            heartbeat()
+            page_products = scrape_current_page(driver, current_page, integrations, heartbeat=heartbeat)
+            heartbeat() # Alerts and enrichment can take a while too
+            alerts_sent = send_page_alerts(
+                page_products, current_page, integrations, category_from_url(seed_url),
+                claim_alert=lambda key: queue.claim_alert(key, worker_id),
+                release_alert=queue.release_alert,
+            )
+
+            # Enqueue the next page before committing; enqueue is a no-op if it's already there
+            heartbeat()
+            if current_page < MAX_PAGES and has_next_page_link(driver, page_index + 1):
+                queue.enqueue(
+                    page_task_key(sweep_id, seed_url, page_index + 1),
+                    {"sweep": sweep_id, "seed": seed_url, "page": page_index + 1},
+                )
+            return {"seed": seed_url, "page": page_index, "products": page_products, "alerts_sent": alerts_sent}
+        except WebDriverException:
+            # Browser is probably dead; start a fresh one for the next task
+            try:
+                state["driver"].quit()
+            except Exception:
+                pass
+            state["driver"] = None
+            raise
+
+    def after_task(task, ok):
+        # A failed page must leave no trace (seen marks, price sightings, discounts),
+        # or its retry skips products and counts the rest twice
+        staged, integrations["staged_writes"] = integrations["staged_writes"], None
+        if seen_filter:
+            if ok:
+                seen_filter.commit_page()
+            else:
+                seen_filter.rollback_page()
+        if ok:
+            try:
+                for write, args, kwargs in staged:
+                    write(*args, **kwargs)
+            except Exception as e:
+                print(f"[ERROR] Worker {worker_id}: failed to record history for '{task.key}': {e}")
+
+    try:
+        committed = run_worker(queue, worker_id, handle_task, idle_timeout=WORKER_IDLE_TIMEOUT, after_task=after_task)
+        print(f"\nWorker {worker_id} finished: committed {committed} page(s).")
+    finally:
+        close_integrations(integrations)
+        if state["driver"]:
+            try:
+                state["driver"].quit()
+            except Exception as quit_e:
+                 print(f"Error while quitting driver: {quit_e}")
+# --- End Distributed Crawl ---
 
+
+def print_configuration(mode, queue_spec):
+    """Prints the effective settings (after config file / env overrides)."""
+    proxy_full_address = proxy_address()
     print("--- SCRAPER CONFIGURATION ---")
     print(f"[*] Target Site: 6pm.com")
+    print(f"[*] Mode: {mode}")
+    if mode != "single": print(f"    - Queue: {queue_spec}")
     print(f"[*] Max Pages to Scrape: {MAX_PAGES}")
     print(f"[*] Use Proxy: {USE_PROXY}")
-    if USE_PROXY and proxy_full_address: print(f"    - Address: {proxy_full_address}")
+    if USE_PROXY and proxy_full_address: print(f"    - Address: {PROXY_HOST}:{PROXY_PORT}")
     elif USE_PROXY: print("    - [WARN] Proxy details missing!")
     print(f"[*] Solve CAPTCHA: {SOLVE_CAPTCHA}")
-    if SOLVE_CAPTCHA and 'YOUR_2CAPTCHA_API_KEY' in TWO_CAPTCHA_API_KEY: print("    - [WARN] 2Captcha API Key missing!")
-    elif SOLVE_CAPTCHA and not TwoCaptcha: print("    - [WARNING] 2Captcha library missing!")
+    if SOLVE_CAPTCHA and is_placeholder(TWO_CAPTCHA_API_KEY): print("    - [WARN] 2Captcha API Key missing!")
+    elif SOLVE_CAPTCHA and importlib.util.find_spec("twocaptcha") is None: print("    - [WARNING] 2Captcha library missing!")
     print(f"[*] Send to Google Sheets: {SEND_TO_GOOGLE_SHEETS}")
     if SEND_TO_GOOGLE_SHEETS:
         print(f"    - Sheet Name: '{GOOGLE_SHEET_NAME}'")
-        if 'YOUR_GOOGLE_SHEET_ID_HERE' in GOOGLE_SHEET_ID:
+        if is_placeholder(GOOGLE_SHEET_ID):
             print(f"    - [ERROR] Sheet ID: NOT SET!")
         else:
             print(f"    - Sheet ID: '{GOOGLE_SHEET_ID[:5]}...{GOOGLE_SHEET_ID[-5:]}'") # Show partial ID
     print(f"[*] Send Telegram Alerts: {SEND_TELEGRAM_ALERTS}") # Added Telegram status
     if SEND_TELEGRAM_ALERTS:
-        print(f"    - Min Discount % for Alert: {MIN_ALERT_DISCOUNT}%")
-        if 'YOUR_BOT_TOKEN_HERE' in TELEGRAM_BOT_TOKEN or 'YOUR_CHAT_ID_HERE' in YOUR_CHAT_ID:
+        print(f"    - Min Discount % for Alert: {MIN_ALERT_DISCOUNT:g}%")
+        if is_placeholder(TELEGRAM_BOT_TOKEN) or is_placeholder(YOUR_CHAT_ID):
             print("    - [WARN] Telegram Bot Token or Chat ID is missing!")
+    print(f"[*] Price History: {TRACK_PRICE_HISTORY} | Deal Scoring: {SCORE_DEALS} | De-dup: {DEDUP_PRODUCTS} | Enrichment: {ENRICH_ALERT_CANDIDATES}")
     print("---")
 
+
+def check_startup_time(runs=3):
+    """
+    Imports this script in fresh interpreters and checks the best time against
+    IMPORT_TIME_BUDGET_MS, and that none of the LAZY_MODULES got imported.
+    Returns a process exit code (0 = within budget).
+    """
+    import subprocess
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    module_name = os.path.splitext(os.path.basename(__file__))[0]
+    probe = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module_name} as m\n"
+        "elapsed = (time.perf_counter() - t) * 1000\n"
+        "print(json.dumps({'ms': elapsed, 'loaded': [n for n in m.LAZY_MODULES if n in sys.modules]}))\n"
+    )
+    timings, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", probe], cwd=script_dir, capture_output=True, text=True, check=True)
+        report = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(report["ms"])
+        loaded.update(report["loaded"])
+
+    best = min(timings)
+    print(f"Import time: {best:.1f} ms (best of {runs}, budget {IMPORT_TIME_BUDGET_MS} ms)")
+    if loaded:
+        print(f"[ERROR] Heavy modules imported at startup: {', '.join(sorted(loaded))}")
+    if best > IMPORT_TIME_BUDGET_MS:
+        print("[ERROR] Import time is over budget.")
+    return 0 if best <= IMPORT_TIME_BUDGET_MS and not loaded else 1
+
+
+def main(argv=None):
+    """Command-line entry point. Returns a process exit code."""
+    parser = argparse.ArgumentParser(description="6pm.com deal finder.")
+    parser.add_argument("urls", nargs="*", help="Search URLs to crawl (defaults to SEARCH_URLS from the config)")
+    parser.add_argument("--config", help=f"JSON config file (default: {CONFIG_FILE} if it exists). SIXPM_<SETTING> env vars override it")
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE", help="Override one setting, e.g. --set MAX_PAGES=5 (repeatable)")
+    parser.add_argument("--mode", choices=["single", "coordinator", "worker"], default="single",
+                        help="single: scrape in this process; coordinator: queue pages for workers; worker: scrape queued pages")
+    parser.add_argument("--queue", help="SQLite file or redis:// URL for coordinator/worker modes (default: WORK_QUEUE)")
+    parser.add_argument("--worker-id", default=socket.gethostname(),
+                        help="Worker name (default: host name). Workers sharing a host need distinct IDs: local history files are kept per ID")
+    parser.add_argument("--no-wait", action="store_true", help="Coordinator: enqueue seeds and exit without collecting results")
+    parser.add_argument("--dry-run", action="store_true", help="Load and print the configuration, then exit without scraping")
+    parser.add_argument("--check-startup", action="store_true", help="Measure import time against IMPORT_TIME_BUDGET_MS and exit")
+    args = parser.parse_args(argv)
+
+    # --- Load Configuration ---
+    try:
+        overrides = dict(item.split("=", 1) for item in args.set)
+    except ValueError:
+        parser.error("--set expects SETTING=VALUE")
+    try:
+        configure(args.config, overrides)
+    except (OSError, ValueError, KeyError) as e: # json.JSONDecodeError is a ValueError
+        print(f"[ERROR] Invalid configuration: {e}")
+        return 2
+    # ---
+
+    if args.check_startup:
+        return check_startup_time()
+
+    search_urls = args.urls or SEARCH_URLS
+    queue_spec = args.queue or WORK_QUEUE
+    print_configuration(args.mode, queue_spec)
+    if args.dry_run:
+        print("Dry run: configuration loaded, nothing scraped.")
+        return 0
+
     # --- Authenticate Google Sheets ---
     gs_client, gs_sheet = None, None
-    if SEND_TO_GOOGLE_SHEETS:
+    if SEND_TO_GOOGLE_SHEETS and args.mode != "worker": # Only the coordinator publishes in distributed mode
         gs_client, gs_sheet = authenticate_google_sheets()
         if not gs_sheet:
             print("[INFO] Google Sheets authentication failed. Data will not be sent to Sheets.")
             # Decide if you want to stop the script entirely or just proceed without Sheets
-            # exit() # Uncomment this line to stop if Sheets connection fails
+            # return 1 # Uncomment this line to stop if Sheets connection fails
     # --- End Authenticate ---
 
-    scrape_6pm(SEARCH_URL, gs_sheet) # Pass the sheet object to the scrape function
+    if args.mode == "single":
+        all_products_data = []
+        integrations = open_integrations()
+        try:
+            for search_url in search_urls:
+                all_products_data.extend(scrape_6pm(search_url, integrations))
+        finally:
+            close_integrations(integrations)
+        save_results(all_products_data, gs_sheet)
+    else:
+        from work_queue import open_work_queue
+        queue = open_work_queue(queue_spec, visibility_timeout=QUEUE_VISIBILITY_TIMEOUT, max_attempts=QUEUE_MAX_ATTEMPTS)
+        try:
+            if args.mode == "coordinator":
+                run_coordinator(queue, search_urls, gs_sheet, wait=not args.no_wait)
+            else:
+                run_queue_worker(queue, args.worker_id)
+        finally:
+            queue.close()
+    return 0
 
 
+if __name__ == "__main__":
+    sys.exit(main())
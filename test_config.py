@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from config import load_settings
+
+
+DEFAULTS = {"MAX_PAGES": 2, "MIN_ALERT_DISCOUNT": 40.0, "USE_PROXY": False, "SEARCH_URLS": ["a"], "TOKEN": "YOUR_ID"}
+
+
+def test_priority_is_file_then_env_then_overrides(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"max_pages": 3, "token": "from-file", "use_proxy": True}))
+    environ = {"SIXPM_MAX_PAGES": "4", "SIXPM_SEARCH_URLS": "b, c"}
+    settings = load_settings(DEFAULTS, path=str(path), environ=environ, overrides={"token": "from-cli"})
+    assert settings == {"MAX_PAGES": 4, "TOKEN": "from-cli", "USE_PROXY": True, "SEARCH_URLS": ["b", "c"]}
+
+
+def test_numeric_settings():
+    assert load_settings(DEFAULTS, environ={"SIXPM_MIN_ALERT_DISCOUNT": "37.5"}) == {"MIN_ALERT_DISCOUNT": 37.5}
+    assert load_settings(DEFAULTS, environ={}, overrides={"MAX_PAGES": "5.0"}) == {"MAX_PAGES": 5}
+    with pytest.raises(ValueError, match="whole number"):
+        load_settings(DEFAULTS, environ={}, overrides={"MAX_PAGES": "2.5"})
+    with pytest.raises(ValueError, match="expected a number"):
+        load_settings(DEFAULTS, environ={"SIXPM_MIN_ALERT_DISCOUNT": "lots"})
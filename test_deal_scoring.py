@@ -0,0 +1,83 @@
+import math
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from deal_scoring import MIN_STD, DealScorer, category_from_url
+
+
+NOW = 1_700_000_000
+
+
+def test_category_from_url():
+    assert category_from_url("https://www.6pm.com/womens/shoes/CK_XAcABAeICAgEY.zso?s=x") == "womens/shoes"
+    assert category_from_url("https://www.6pm.com/") == "all"
+
+
+def test_zscore_and_percentile_match_hand_computation(tmp_path):
+    scorer = DealScorer(str(tmp_path / "deals.npz"))
+    history = [10.0, 20.0, 30.0, 40.0, 50.0]
+    scorer.add_batch(["Acme"] * 5, ["shoes"] * 5, history, ts=NOW)
+
+    scores = scorer.score_batch(["Acme", "Acme", "Other"], ["shoes", "shoes", "shoes"], [30.0, 60.0, 45.0])
+
+    mean = sum(history) / len(history)                                       # 30
+    std = math.sqrt(sum((x - mean) ** 2 for x in history) / len(history))    # sqrt(200)
+    assert scores["brand_z"][0] == pytest.approx(0.0)
+    assert scores["brand_z"][1] == pytest.approx((60.0 - mean) / std)
+    # Mid-rank: 30 has two values below and one tie -> (2 + 3) / 2 / 5
+    assert scores["brand_pct"][0] == pytest.approx(50.0)
+    assert scores["brand_pct"][1] == pytest.approx(100.0)
+    assert scores["category_pct"][2] == pytest.approx((4 + 4) / 2 / 5 * 100)
+
+    # A brand with no history scores NaN and reports zero observations
+    assert math.isnan(scores["brand_z"][2])
+    assert scores["brand_n"].tolist() == [5, 5, 0]
+
+
+def test_std_floor_keeps_constant_brands_from_flagging_small_bumps(tmp_path):
+    scorer = DealScorer(str(tmp_path / "deals.npz"))
+    scorer.add_batch(["Flat"] * 30, ["shoes"] * 30, [40.0] * 30, ts=NOW)
+    scores = scorer.score_batch(["Flat"], ["shoes"], [42.0])
+    assert scores["brand_z"][0] == pytest.approx(2.0 / MIN_STD)
+    assert scores["brand_z"][0] < 2.0
+
+
+def test_history_round_trips_and_trims(tmp_path):
+    path = str(tmp_path / "deals.npz")
+    scorer = DealScorer(path, history_days=1)
+    scorer.add_batch(["A"], ["c"], [10.0], ts=NOW - 2 * 86400)
+    scorer.add_batch(["B"], ["c"], [20.0], ts=int(time.time()))
+    scorer.save()
+
+    reloaded = DealScorer(path, history_days=1)
+    assert reloaded.discounts.tolist() == [20.0]
+    assert reloaded.brands == {"A": 0, "B": 1}
+
+
+def test_percentiles_survive_a_save_and_reload(tmp_path):
+    path = str(tmp_path / "deals.npz")
+    history = [50.96, 50.96, 33.33, 70.01]
+    scorer = DealScorer(path)
+    scorer.add_batch(["Acme"] * 4, ["shoes"] * 4, history, ts=int(time.time()))
+    before = scorer.score_batch(["Acme"], ["shoes"], [50.96])
+    scorer.save()
+
+    after = DealScorer(path).score_batch(["Acme"], ["shoes"], [50.96])
+    # One value below, two ties -> (1 + 3) / 2 / 4
+    assert before["brand_pct"][0] == after["brand_pct"][0] == pytest.approx(50.0)
+    assert after["brand_z"][0] == pytest.approx(before["brand_z"][0])
+
+
+def test_float32_history_is_repaired_on_load(tmp_path):
+    path = str(tmp_path / "deals.npz")
+    np.savez(
+        path,
+        brand_labels=np.array(["Acme"]), category_labels=np.array(["shoes"]),
+        ts=np.array([int(time.time())], dtype=np.int64),
+        brand_codes=np.array([0]), category_codes=np.array([0]),
+        discounts=np.array([50.96], dtype=np.float32),
+    )
+    assert DealScorer(path).discounts.tolist() == [50.96]
@@ -0,0 +1,56 @@
+import scrapperV3
+from dedup import BloomFilter, SeenFilter
+
+
+def test_bloom_round_trip(tmp_path):
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(500):
+        bloom.add(f"style:{i}")
+    restored = BloomFilter.from_bytes(bloom.to_bytes(), 1000)
+    assert (restored.num_bits, restored.num_hashes, restored.count) == (bloom.num_bits, bloom.num_hashes, 500)
+    assert all(f"style:{i}" in restored for i in range(500))
+    false_positives = sum(f"other:{i}" in restored for i in range(10_000))
+    assert false_positives < 300 # ~1% expected at half capacity; leave plenty of slack
+
+
+def test_seen_filter_persists_and_rotates(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    seen = SeenFilter(path, capacity=10)
+    for i in range(10):
+        seen.remember(f"style:{i}")
+    assert seen.previous is None and seen.current.is_full()
+    seen.remember("style:10") # rotates: the full generation becomes the previous one
+    assert seen.previous is not None and seen.current.count == 1
+    seen.save()
+
+    reloaded = SeenFilter(path, capacity=10)
+    assert reloaded.seen_before("style:0") and reloaded.seen_before("style:10")
+    assert not reloaded.seen_before("style:new")
+    assert (reloaded.history_hits, reloaded.misses) == (2, 1)
+
+    # A second rotation ages out the oldest generation
+    for i in range(11, 30):
+        reloaded.remember(f"style:{i}")
+    assert "style:0" not in reloaded.current and "style:0" not in reloaded.previous
+
+
+def test_seen_in_run_counts_duplicates(tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.bloom"))
+    assert not seen.seen_in_run("1")
+    assert seen.seen_in_run("1")
+    assert seen.run_hits == 1
+
+
+def test_failed_send_does_not_mark_alert_as_sent(tmp_path, monkeypatch):
+    seen = SeenFilter(str(tmp_path / "seen.bloom"))
+    product = {"style_id": "42", "title": "Boot", "brand": "Acme", "current_price": 30.0, "discount_percent": 70}
+    monkeypatch.setattr(scrapperV3, "SEND_TELEGRAM_ALERTS", True)
+    monkeypatch.setattr(scrapperV3.time, "sleep", lambda seconds: None)
+
+    monkeypatch.setattr(scrapperV3, "send_telegram_alert", lambda deal: False)
+    assert scrapperV3.send_page_alerts([dict(product)], 1, {"seen_filter": seen}, "shoes") == 0
+    assert not seen.alert_already_sent(scrapperV3.alert_key_for(product))
+
+    monkeypatch.setattr(scrapperV3, "send_telegram_alert", lambda deal: True)
+    assert scrapperV3.send_page_alerts([dict(product)], 1, {"seen_filter": seen}, "shoes") == 1
+    assert seen.alert_already_sent(scrapperV3.alert_key_for(product))
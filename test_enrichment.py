@@ -0,0 +1,171 @@
+import os
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from enrichment import EnrichmentStats, HttpCache, _fetch_page, parse_product_page
+
+
+NOW = 1_700_000_000.0
+
+APP_STATE_PAGE = """<html><script>window.__INITIAL_STATE__ = {"product": {"detail": {"styles": [
+  {"color": "Black", "stocks": [{"size": "9", "onHand": "2"}, {"size": "10.5", "onHand": 0}]},
+  {"color": "Tan", "stocks": [{"size": "8", "onHand": 1}, {"size": "XL", "onHand": 3}]}
+]}}};</script></html>"""
+
+JSON_LD_PAGE = """<html><script type="application/ld+json">
+{"@type": "Product", "color": "Navy", "offers": [{"availability": "https://schema.org/InStock"}]}
+</script></html>"""
+
+OUT_OF_STOCK_PAGE = """<html><script>window.__INITIAL_STATE__ = {"product": {"detail": {"styles": [
+  {"color": "Red", "stocks": [{"size": "7", "onHand": 0}]}
+]}}};</script></html>"""
+
+
+# --- Parsing ---
+def test_parse_app_state():
+    details = parse_product_page(APP_STATE_PAGE)
+    assert details == {"color_variants": ["Black", "Tan"], "available_sizes": ["8", "9", "XL"], "in_stock": True}
+
+
+def test_parse_json_ld_fallback():
+    details = parse_product_page(JSON_LD_PAGE)
+    assert details == {"color_variants": ["Navy"], "available_sizes": [], "in_stock": True}
+
+
+def test_parse_out_of_stock():
+    details = parse_product_page(OUT_OF_STOCK_PAGE)
+    assert details == {"color_variants": ["Red"], "available_sizes": [], "in_stock": False}
+    assert parse_product_page("<html>nothing here</html>")["in_stock"] is None
+
+
+# --- Cache Freshness ---
+@pytest.mark.parametrize("headers, expires_at", [
+    ({"Cache-Control": "public, max-age=600"}, NOW + 600),
+    ({"Cache-Control": "no-cache"}, NOW),
+    ({"Expires": "Tue, 14 Nov 2023 22:23:20 GMT"}, 1_700_000_600.0),
+    ({}, NOW + 3600), # falls back to default_max_age
+])
+def test_expires_at(tmp_path, headers, expires_at):
+    cache = HttpCache(str(tmp_path), default_max_age=3600)
+    assert cache._expires_at(headers, NOW) == expires_at
+
+
+def test_no_store_is_not_cached(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    cache.store("https://x/1", {"Cache-Control": "no-store"}, b"body", now=NOW)
+    assert cache.get("https://x/1") == (None, None)
+
+
+# --- Revalidation ---
+class FakeResponse:
+    def __init__(self, status, headers, body=b""):
+        self.status, self.headers, self._body, self.charset = status, headers, body, "utf-8"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(self.status)
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers))
+        return self.response
+
+
+def test_not_modified_reuses_body_and_refreshes_meta(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    url = "https://www.6pm.com/p/1"
+    cache.store(url, {"ETag": '"v1"', "Cache-Control": "max-age=0"}, b"cached page", now=NOW)
+    session = FakeSession(FakeResponse(304, {"ETag": '"v2"', "Cache-Control": "max-age=900"}))
+    stats = EnrichmentStats()
+
+    html = asyncio.run(_fetch_page(session, asyncio.Semaphore(1), cache, url, stats))
+
+    assert html == "cached page"
+    assert session.requests == [(url, {"If-None-Match": '"v1"'})]
+    assert (stats.not_modified, stats.fetched) == (1, 0)
+    meta, body = cache.get(url)
+    assert body == b"cached page"
+    assert meta["etag"] == '"v2"' and meta["expires_at"] > time.time() + 800
+
+
+# --- Pruning ---
+def _store_aged(cache, url, age_seconds, size=1000):
+    cache.store(url, {}, b"x" * size)
+    meta_path, _ = cache._paths(url)
+    stamp = time.time() - age_seconds
+    os.utime(meta_path, (stamp, stamp))
+
+
+def test_prune_drops_old_then_least_recently_validated(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    for i in range(5):
+        _store_aged(cache, f"https://x/{i}", age_seconds=i * 86400) # x/0 newest ... x/4 oldest
+    with open(os.path.join(str(tmp_path), "orphan.body"), "wb") as f:
+        f.write(b"left by an interrupted store")
+
+    # Metadata sizes vary by a byte or two (float timestamps), so cap at exactly the two newest entries
+    keep_bytes = sum(os.path.getsize(p) for i in (0, 1) for p in cache._paths(f"https://x/{i}"))
+    removed = cache.prune(max_age=3.5 * 86400, max_bytes=keep_bytes)
+
+    assert removed == 4 # x/4 by age, x/3 and x/2 by the byte cap, plus the orphan
+    assert [cache.get(f"https://x/{i}")[0] is not None for i in range(5)] == [True, True, False, False, False]
+    assert not os.path.exists(os.path.join(str(tmp_path), "orphan.body"))
+
+
+# --- Pooled Session ---
+def test_enricher_reuses_one_connection_across_pages(tmp_path):
+    pytest.importorskip("aiohttp")
+    from enrichment import ProductEnricher
+
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            body = APP_STATE_PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    enricher = ProductEnricher(str(tmp_path), concurrency=1)
+    try:
+        for page in range(3):
+            products = [{"product_url": f"{base}/p/{page}"}]
+            stats = enricher.enrich(products)
+            assert stats.fetched == 1 and products[0]["in_stock"] is True
+    finally:
+        enricher.close()
+        server.shutdown()
+        server.server_close()
+    assert len(connections) == 1
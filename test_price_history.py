@@ -0,0 +1,115 @@
+import os
+
+from price_history import HEADER, RECORD, SECONDS_PER_DAY, PriceHistoryStore, style_key
+
+
+NOW = 1_700_000_000
+
+
+def test_torn_trailing_record_is_dropped_on_open(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = PriceHistoryStore(path)
+    store.record("123", 50.0, ts=NOW - 60)
+    store.record("123", 40.0, ts=NOW)
+    store.close()
+
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03") # an interrupted append
+    store = PriceHistoryStore(path)
+    assert os.path.getsize(path) == HEADER.size + 2 * RECORD.size
+    summary = store.summary("123")
+    assert (summary.min_cents, summary.max_cents, summary.last_cents) == (4000, 5000, 4000)
+
+    # New records land aligned after the truncated tail
+    store.record("123", 30.0, ts=NOW + 60)
+    store.close()
+    assert PriceHistoryStore(path).summary("123").last_cents == 3000
+
+
+def test_is_lowest_in_window(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "history.bin"))
+    assert not store.is_lowest_in("1", 10.0, now=NOW) # no prior observation
+    store.record("1", 20.0, ts=NOW - 100 * SECONDS_PER_DAY)
+    store.record("1", 35.0, ts=NOW - 10 * SECONDS_PER_DAY)
+    assert store.is_lowest_in("1", 30.0, days=90, now=NOW)
+    assert not store.is_lowest_in("1", 30.0, days=120, now=NOW)
+
+
+def test_same_price_runs_collapse_in_memory(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "history.bin"))
+    for i in range(100):
+        store.record("1", 25.0, ts=NOW + i)
+    summary = store.summary("1")
+    assert list(summary.recent) == [(NOW, 2500), (NOW + 99, 2500)]
+    assert summary.window_min(NOW + 50) == 2500
+
+
+def test_compact_keeps_window_and_anchors(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = PriceHistoryStore(path, retention_days=30)
+    old = NOW - 60 * SECONDS_PER_DAY
+    store.record("1", 10.0, ts=old)      # all-time min, outside the window
+    store.record("1", 99.0, ts=old + 1)  # all-time max, outside the window
+    store.record("1", 50.0, ts=old + 2)  # neither: dropped
+    for i in range(5):
+        store.record("1", 60.0, ts=NOW - 10 + i) # run of five: keeps first and last
+
+    assert store.compact(now=NOW)
+    assert os.path.getsize(path) == HEADER.size + 4 * RECORD.size
+    summary = store.summary("1")
+    assert (summary.min_cents, summary.max_cents, summary.last_cents) == (1000, 9900, 6000)
+    assert summary.last_ts == NOW - 6
+    store.close()
+
+
+def test_compact_is_bounded_when_window_alone_is_too_big(tmp_path):
+    path = str(tmp_path / "history.bin")
+    max_bytes = HEADER.size + 100 * RECORD.size
+    store = PriceHistoryStore(path, retention_days=30, max_bytes=max_bytes)
+    for i in range(400):
+        # Prices alternate so nothing collapses; every record is in the window
+        store.record(str(i % 10), 10.0 + (i % 2), ts=NOW - 400 + i)
+    assert store.compact_if_needed()
+    assert os.path.getsize(path) <= max_bytes // 2
+
+    # Newest records survive the cut
+    assert store.summary("9").last_ts == NOW - 1
+    assert style_key("9") in store.index
+    store.close()
+
+
+def test_index_checkpoint_only_replays_the_tail(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = PriceHistoryStore(path)
+    for i in range(40):
+        store.record(str(i % 4), 10.0 + i, ts=NOW + i)
+    expected = {key: store.summary(str(key)).to_state() for key in range(4)}
+    store.close() # writes the checkpoint
+
+    # Appended after the checkpoint, then "crashed" without close()
+    store = PriceHistoryStore(path)
+    assert isinstance(store.index[style_key("0")], int) # not materialized until used
+    store.record("0", 5.0, ts=NOW + 100)
+    store._file.close()
+
+    reopened = PriceHistoryStore(path)
+    for key in (1, 2, 3):
+        assert _plain(reopened.summary(str(key)).to_state()) == _plain(expected[key])
+    summary = reopened.summary("0")
+    assert (summary.min_cents, summary.last_cents, summary.count) == (500, 500, 11)
+    assert summary.median_cents == 2600 # 5, 10, 14, ..., 46 -> sixth of eleven
+    reopened.close()
+
+
+def test_mismatched_checkpoint_is_ignored(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = PriceHistoryStore(path, retention_days=90)
+    store.record("1", 20.0, ts=NOW)
+    store.close()
+    store = PriceHistoryStore(path, retention_days=30) # different settings: replay the log instead
+    assert store.summary("1").last_cents == 2000
+    store.close()
+
+
+def _plain(state):
+    return [list(value) if not isinstance(value, int) else value for value in state]
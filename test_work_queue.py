@@ -0,0 +1,243 @@
+import json
+import time
+
+import pytest
+
+import scrapperV3
+from dedup import SeenFilter
+from work_queue import RedisWorkQueue, SQLiteWorkQueue, run_worker
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def queue(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        q = SQLiteWorkQueue(str(tmp_path / "queue.sqlite"), visibility_timeout=60, max_attempts=2)
+    else:
+        # In-process Redis with Lua scripting; skipped when fakeredis[lua] isn't installed
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        redis = pytest.importorskip("redis")
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(
+            redis.Redis, "from_url", classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs))
+        )
+        q = RedisWorkQueue("redis://fake", visibility_timeout=60, max_attempts=2)
+    yield q
+    q.close()
+
+
+def expire_leases(queue):
+    if isinstance(queue, SQLiteWorkQueue):
+        queue.conn.execute("UPDATE tasks SET lease_expires = 0 WHERE status = 'leased'")
+    else:
+        leased = queue._k("leased")
+        for key in queue.client.zrange(leased, 0, -1):
+            queue.client.zadd(leased, {key: 0})
+
+
+def test_enqueue_is_idempotent(queue):
+    assert queue.enqueue("a", {"n": 1})
+    assert not queue.enqueue("a", {"n": 2})
+    assert queue.lease("w1").payload == {"n": 1}
+
+
+def test_expired_lease_is_handed_to_another_worker(queue):
+    queue.enqueue("a", {})
+    first = queue.lease("w1")
+    assert queue.lease("w2") is None # still leased
+
+    expire_leases(queue)
+    second = queue.lease("w2")
+    assert (second.key, second.attempts) == ("a", 2)
+    # The stale holder can no longer extend or fail the new lease
+    assert not queue.extend(first)
+    queue.fail(first, "late")
+    assert queue.counts()["leased"] == 1
+
+    assert queue.complete(second, {"ok": True}, "w2")
+    assert not queue.complete(first, {"ok": False}, "w1") # exactly-once result
+    assert queue.results() == {"a": {"ok": True}}
+
+
+def test_fail_retries_then_parks_after_max_attempts(queue):
+    queue.enqueue("a", {})
+    queue.fail(queue.lease("w1"), "boom")
+    assert queue.counts()["pending"] == 1
+    queue.fail(queue.lease("w1"), "boom again")
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    assert queue.lease("w1") is None
+
+
+def test_expired_lease_on_last_attempt_is_parked(queue):
+    queue.enqueue("a", {})
+    queue.fail(queue.lease("w1"), "boom")
+    queue.lease("w1")
+    expire_leases(queue)
+    assert queue.lease("w2") is None
+    assert queue.counts()["failed"] == 1
+
+
+def test_extend_keeps_a_slow_page_from_being_handed_out(queue):
+    queue.enqueue("a", {})
+    task = queue.lease("w1")
+    expire_leases(queue) # the deadline passed while still scraping...
+    assert queue.extend(task) # ...but a heartbeat renews it before anyone else leases
+    assert queue.lease("w2") is None
+    assert queue.complete(task, {}, "w1")
+    assert not queue.extend(task) # nothing left to extend once done
+
+
+def test_alert_claims_are_exclusive_until_released(queue):
+    assert queue.claim_alert("alert:1:100", "w1")
+    assert not queue.claim_alert("alert:1:100", "w2")
+    queue.release_alert("alert:1:100")
+    assert queue.claim_alert("alert:1:100", "w2")
+
+
+def test_purge_ages_out_old_alert_claims(queue, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(time, "time", lambda: 1_000_000.0)
+        assert queue.claim_alert("alert:old:100", "w1")
+    assert queue.claim_alert("alert:new:100", "w1")
+    queue.purge(keep_prefix="sweep/", alert_max_age=7 * 86400)
+    assert queue.claim_alert("alert:old:100", "w2")
+    assert not queue.claim_alert("alert:new:100", "w2")
+
+
+def test_purge_keeps_only_the_current_sweep(queue):
+    for sweep in ("old", "new"):
+        queue.enqueue(f"{sweep}/done", {})
+        queue.complete(queue.lease("w1"), {"sweep": sweep}, "w1")
+    queue.enqueue("old/failed", {})
+    for _ in range(2):
+        queue.fail(queue.lease("w1"), "boom")
+    assert queue.purge(keep_prefix="new/") == 2
+    assert queue.results() == {"new/done": {"sweep": "new"}}
+    assert queue.results(prefix="old/") == {}
+    assert queue.counts()["failed"] == 0
+
+
+def test_retried_page_is_not_skipped_as_an_in_run_duplicate(queue, tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.bloom"))
+    queue.enqueue("page", {"styles": ["1", "2", "3"]})
+    attempts = []
+
+    def handle(task):
+        seen.begin_page()
+        fresh = [s for s in task.payload["styles"] if not seen.seen_in_run(s)]
+        for style_id in fresh:
+            seen.remember(f"style:{style_id}")
+        attempts.append(fresh)
+        if len(attempts) == 1:
+            raise RuntimeError("browser crashed after scraping")
+        return {"products": fresh}
+
+    def after_task(task, ok):
+        if ok:
+            seen.commit_page()
+        else:
+            seen.rollback_page()
+
+    assert run_worker(queue, "w1", handle, idle_timeout=0, poll_interval=0, after_task=after_task) == 1
+    assert attempts == [["1", "2", "3"], ["1", "2", "3"]]
+    assert queue.results() == {"page": {"products": ["1", "2", "3"]}}
+    assert seen.current.count == 3 # remembered once, by the committed attempt
+    assert seen.seen_in_run("1")
+
+
+def test_coordinator_recrawls_and_publishes_only_its_own_sweep(queue, tmp_path, monkeypatch):
+    output = tmp_path / "out.json"
+    monkeypatch.setattr(scrapperV3, "OUTPUT_JSON_FILE", str(output))
+    monkeypatch.setattr(scrapperV3, "SEND_TO_GOOGLE_SHEETS", False)
+    seeds = ["https://www.6pm.com/a.zso", "https://www.6pm.com/b.zso"]
+    sweeps = iter(["sweep1", "sweep2"])
+    monkeypatch.setattr(scrapperV3, "new_sweep_id", lambda: next(sweeps))
+
+    def fake_workers(seconds):
+        # Stands in for workers, tagging each product with the sweep that produced it
+        while (task := queue.lease("w1")) is not None:
+            product = {"style_id": task.payload["seed"][-5], "sweep": task.payload["sweep"]}
+            queue.complete(task, {"products": [product]}, "w1")
+
+    monkeypatch.setattr(scrapperV3.time, "sleep", fake_workers)
+
+    scrapperV3.run_coordinator(queue, seeds, None)
+    assert {p["sweep"] for p in json.loads(output.read_text())} == {"sweep1"}
+
+    scrapperV3.run_coordinator(queue, seeds, None)
+    published = json.loads(output.read_text())
+    assert [p["sweep"] for p in published] == ["sweep2", "sweep2"]
+    # Earlier sweeps are cleared when a new one starts
+    assert set(queue.results()) == {scrapperV3.page_task_key("sweep2", seed, 0) for seed in seeds}
+
+
+class FakeDriver:
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+
+class RecordingStore:
+    """Stands in for PriceHistoryStore / DealScorer and counts the writes that reach it."""
+
+    def __init__(self):
+        self.writes = []
+
+    def record(self, style_id, price, ts=None):
+        self.writes.append(style_id)
+
+    def add_batch(self, brands, categories, discounts, ts=None):
+        self.writes.extend(brands)
+
+
+def test_failed_page_leaves_no_history_behind(queue, tmp_path, monkeypatch):
+    price_history, deal_scorer = RecordingStore(), RecordingStore()
+    integrations = {
+        "price_history": price_history, "deal_scorer": deal_scorer,
+        "seen_filter": SeenFilter(str(tmp_path / "seen.bloom")), "enricher": None,
+    }
+    failures = iter([True, False])
+
+    def fake_scrape(driver, current_page, integrations, heartbeat=None):
+        products = []
+        for style_id in ("1", "2"):
+            if not integrations["seen_filter"].seen_in_run(style_id):
+                scrapperV3.write_or_stage(integrations, price_history.record, style_id, 10.0)
+                products.append({"style_id": style_id, "brand": f"b{style_id}", "discount_percent": 10.0})
+        return products
+
+    def flaky_next_page_link(driver, next_page_index):
+        if next(failures):
+            raise RuntimeError("browser died after the page was scraped")
+        return False
+
+    def fake_score(integrations, page_products, category):
+        scrapperV3.write_or_stage(integrations, integrations["deal_scorer"].add_batch, [p["brand"] for p in page_products], [], [])
+
+    for name, value in {
+        "load_selenium": lambda: None, "create_driver": FakeDriver, "solve_captcha_if_present": lambda driver: False,
+        "wait_for_product_grid": lambda driver, page: True, "scrape_current_page": fake_scrape,
+        "score_page_deals": fake_score, "has_next_page_link": flaky_next_page_link,
+        "open_integrations": lambda worker_id=None: integrations, "close_integrations": lambda integrations: None,
+        "WORKER_IDLE_TIMEOUT": 0, "SEND_TELEGRAM_ALERTS": False,
+    }.items():
+        monkeypatch.setattr(scrapperV3, name, value)
+    monkeypatch.setattr(scrapperV3, "WebDriverException", type("WebDriverException", (Exception,), {}), raising=False)
+    monkeypatch.setattr(scrapperV3.random, "uniform", lambda a, b: 0)
+    monkeypatch.setattr(scrapperV3.time, "sleep", lambda seconds: None)
+
+    queue.enqueue("s/seed#p0", {"sweep": "s", "seed": "https://www.6pm.com/a.zso", "page": 0})
+    scrapperV3.run_queue_worker(queue, "w1")
+
+    result = queue.results()["s/seed#p0"]
+    assert [p["style_id"] for p in result["products"]] == ["1", "2"] # retry wasn't emptied by the failed attempt
+    assert price_history.writes == ["1", "2"] # and nothing was counted twice
+    assert deal_scorer.writes == ["b1", "b2"]
+
+
+def test_worker_state_files_are_per_worker():
+    assert scrapperV3.worker_state_file("6pm_seen.bloom") == "6pm_seen.bloom"
+    assert scrapperV3.worker_state_file("6pm_seen.bloom", "host-1") == "6pm_seen.host-1.bloom"
+    assert scrapperV3.worker_state_file("data/6pm_deal_history.npz", "a b/c") == "data/6pm_deal_history.a_b_c.npz"
@@ -0,0 +1,462 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+from collections import namedtuple
+
+
+# A leased task. `token` identifies this particular lease, so a worker whose lease
+# expired (and was handed to someone else) can't fail or extend the new holder's lease.
+Task = namedtuple("Task", "key payload token attempts")
+
+
+class LeaseLost(RuntimeError):
+    """Raised by a task handler that finds its lease was handed to another worker."""
+
+
+# --- SQLite Backend ---
+class SQLiteWorkQueue:
+    """
+    Leased task queue in a single SQLite file (WAL mode).
+    Safe for many processes on one host, or several hosts sharing a local-semantics
+    filesystem. Don't put it on NFS/SMB; use the Redis backend for that.
+    """
+
+    def __init__(self, path, visibility_timeout=300, max_attempts=3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_token TEXT,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+            CREATE TABLE IF NOT EXISTS results (
+                task_key TEXT PRIMARY KEY,
+                worker TEXT,
+                payload TEXT NOT NULL,
+                committed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS alerts (
+                alert_key TEXT PRIMARY KEY,
+                worker TEXT,
+                sent_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS alerts_sent_at ON alerts (sent_at);
+        """)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front so lease/complete can't interleave
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, key, payload):
+        """Adds a task unless one with the same key already exists. Returns True if added."""
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO tasks (task_key, payload, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(payload), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def lease(self, worker_id):
+        """Leases the oldest available task (pending, or leased with an expired lease)."""
+        now = time.time()
+        self._transaction()
+        try:
+            # Expired leases that are out of retries are parked as failed
+            self.conn.execute(
+                "UPDATE tasks SET status = 'failed', last_error = COALESCE(last_error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = self.conn.execute(
+                "SELECT task_key, payload, attempts FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_token = ?, "
+                "lease_owner = ?, lease_expires = ? WHERE task_key = ?",
+                (token, worker_id, now + self.visibility_timeout, row[0]),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return Task(row[0], json.loads(row[1]), token, row[2] + 1)
+
+    def extend(self, task):
+        """Pushes the lease deadline out again. Returns False if the lease was lost."""
+        cur = self.conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE task_key = ? AND lease_token = ? AND status = 'leased'",
+            (time.time() + self.visibility_timeout, task.key, task.token),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, task, result, worker_id=None):
+        """
+        Commits a task's result exactly once. Returns True if this call stored it,
+        False if a result for the task was already committed (e.g. by a retry).
+        """
+        self._transaction()
+        try:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO results (task_key, worker, payload, committed_at) VALUES (?, ?, ?, ?)",
+                (task.key, worker_id, json.dumps(result), time.time()),
+            )
+            committed = cur.rowcount == 1
+            self.conn.execute(
+                "UPDATE tasks SET status = 'done', lease_token = NULL, lease_expires = NULL WHERE task_key = ?",
+                (task.key,),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return committed
+
+    def fail(self, task, error):
+        """Releases a lease after an error; the task is retried until max_attempts."""
+        self.conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_token = NULL, lease_expires = NULL, last_error = ? "
+            "WHERE task_key = ? AND lease_token = ?",
+            (self.max_attempts, str(error)[:500], task.key, task.token),
+        )
+
+    def claim_alert(self, alert_key, worker_id=None):
+        """True exactly once per alert key across all workers."""
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO alerts (alert_key, worker, sent_at) VALUES (?, ?, ?)",
+            (alert_key, worker_id, time.time()),
+        )
+        return cur.rowcount == 1
+
+    def release_alert(self, alert_key):
+        """Gives up a claim whose alert could not be sent, so a later attempt can claim it again."""
+        self.conn.execute("DELETE FROM alerts WHERE alert_key = ?", (alert_key,))
+
+    def results(self, prefix=""):
+        """Returns {task_key: result} for every committed task whose key starts with prefix."""
+        rows = self.conn.execute(
+            "SELECT task_key, payload FROM results WHERE substr(task_key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return {key: json.loads(payload) for key, payload in rows}
+
+    def purge(self, keep_prefix, alert_max_age=None):
+        """
+        Deletes finished tasks and results whose key doesn't start with keep_prefix, and
+        alert claims older than alert_max_age seconds (if given). Returns tasks removed.
+        """
+        self._transaction()
+        try:
+            if alert_max_age is not None:
+                self.conn.execute("DELETE FROM alerts WHERE sent_at < ?", (time.time() - alert_max_age,))
+            self.conn.execute(
+                "DELETE FROM results WHERE substr(task_key, 1, ?) != ?", (len(keep_prefix), keep_prefix)
+            )
+            cur = self.conn.execute(
+                "DELETE FROM tasks WHERE status IN ('done', 'failed') AND substr(task_key, 1, ?) != ?",
+                (len(keep_prefix), keep_prefix),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount
+
+    def counts(self):
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for status, n in self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"):
+            counts[status] = n
+        return counts
+
+    def close(self):
+        self.conn.close()
+# --- End SQLite Backend ---
+
+
+# --- Redis Backend ---
+# Each multi-step operation is a Lua script so it runs atomically on the server.
+_REDIS_ENQUEUE = """
+if redis.call('HSETNX', KEYS[1], 'payload', ARGV[2]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], 'status', 'pending', 'attempts', 0, 'created_at', ARGV[3])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+_REDIS_LEASE = """
+local prefix, now, expires, token, owner, max_attempts = ARGV[1], tonumber(ARGV[2]), ARGV[3], ARGV[4], ARGV[5], tonumber(ARGV[6])
+local pending, leased, failed = prefix .. ':pending', prefix .. ':leased', prefix .. ':failed'
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', leased, '-inf', now)) do
+    redis.call('ZREM', leased, key)
+    local task = prefix .. ':task:' .. key
+    if tonumber(redis.call('HGET', task, 'attempts')) >= max_attempts then
+        redis.call('HSET', task, 'status', 'failed', 'last_error', 'lease expired')
+        redis.call('SADD', failed, key)
+    else
+        redis.call('HSET', task, 'status', 'pending')
+        redis.call('RPUSH', pending, key)
+    end
+end
+-- Skip keys whose task was completed by a worker that outlived its lease
+local key, task
+repeat
+    key = redis.call('RPOP', pending)
+    if not key then return nil end
+    task = prefix .. ':task:' .. key
+until redis.call('HGET', task, 'status') == 'pending'
+local attempts = redis.call('HINCRBY', task, 'attempts', 1)
+redis.call('HSET', task, 'status', 'leased', 'token', token, 'owner', owner)
+redis.call('ZADD', leased, expires, key)
+return {key, redis.call('HGET', task, 'payload'), attempts}
+"""
+_REDIS_EXTEND = """
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] or redis.call('HGET', KEYS[1], 'status') ~= 'leased' then return 0 end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+return 1
+"""
+_REDIS_COMPLETE = """
+local committed = redis.call('HSETNX', KEYS[3], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[1], 'status', 'done', 'token', '')
+redis.call('ZREM', KEYS[2], ARGV[1])
+return committed
+"""
+_REDIS_FAIL = """
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[1], 'token', '', 'last_error', ARGV[4])
+if tonumber(redis.call('HGET', KEYS[1], 'attempts')) >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[1], 'status', 'failed')
+    redis.call('SADD', KEYS[4], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], 'status', 'pending')
+    redis.call('LPUSH', KEYS[3], ARGV[1])
+end
+return 1
+"""
+
+
+def _redis_glob_escape(text):
+    """Escapes glob metacharacters so text can be used as a literal HSCAN MATCH prefix."""
+    return "".join("\\" + ch if ch in "*?[]\\" else ch for ch in text)
+
+
+class RedisWorkQueue:
+    """Same interface as SQLiteWorkQueue, backed by any Redis-compatible server (redis, valkey, ...)."""
+
+    def __init__(self, url, prefix="6pm", visibility_timeout=300, max_attempts=3):
+        # Only import redis when a redis:// queue is used (the SQLite backend needs nothing extra)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("redis is required for a redis:// work queue (pip install redis)") from None
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._enqueue = self.client.register_script(_REDIS_ENQUEUE)
+        self._lease = self.client.register_script(_REDIS_LEASE)
+        self._extend = self.client.register_script(_REDIS_EXTEND)
+        self._complete = self.client.register_script(_REDIS_COMPLETE)
+        self._fail = self.client.register_script(_REDIS_FAIL)
+
+    def _k(self, name):
+        return f"{self.prefix}:{name}"
+
+    def enqueue(self, key, payload):
+        return self._enqueue(keys=[self._k(f"task:{key}"), self._k("pending")], args=[key, json.dumps(payload), time.time()]) == 1
+
+    def lease(self, worker_id):
+        now = time.time()
+        token = uuid.uuid4().hex
+        row = self._lease(args=[self.prefix, now, now + self.visibility_timeout, token, worker_id, self.max_attempts])
+        if not row:
+            return None
+        return Task(row[0], json.loads(row[1]), token, int(row[2]))
+
+    def extend(self, task):
+        return self._extend(
+            keys=[self._k(f"task:{task.key}"), self._k("leased")],
+            args=[task.token, time.time() + self.visibility_timeout, task.key],
+        ) == 1
+
+    def complete(self, task, result, worker_id=None):
+        return self._complete(
+            keys=[self._k(f"task:{task.key}"), self._k("leased"), self._k("results")],
+            args=[task.key, json.dumps(result)],
+        ) == 1
+
+    def fail(self, task, error):
+        self._fail(
+            keys=[self._k(f"task:{task.key}"), self._k("leased"), self._k("pending"), self._k("failed")],
+            args=[task.key, task.token, self.max_attempts, str(error)[:500]],
+        )
+
+    def claim_alert(self, alert_key, worker_id=None):
+        # Sorted set scored by claim time, so purge() can age claims out
+        return self.client.zadd(self._k("alert_claims"), {alert_key: time.time()}, nx=True) == 1
+
+    def release_alert(self, alert_key):
+        self.client.zrem(self._k("alert_claims"), alert_key)
+
+    def results(self, prefix=""):
+        return {
+            key: json.loads(payload)
+            for key, payload in self.client.hscan_iter(self._k("results"), match=_redis_glob_escape(prefix) + "*")
+        }
+
+    def purge(self, keep_prefix, alert_max_age=None):
+        if alert_max_age is not None:
+            self.client.zremrangebyscore(self._k("alert_claims"), "-inf", time.time() - alert_max_age)
+        # Finished tasks are exactly those with a committed result or in the failed set
+        finished = [key for key in self.client.hkeys(self._k("results")) if not key.startswith(keep_prefix)]
+        failed = [key for key in self.client.smembers(self._k("failed")) if not key.startswith(keep_prefix)]
+        pipe = self.client.pipeline()
+        if finished:
+            pipe.hdel(self._k("results"), *finished)
+        if failed:
+            pipe.srem(self._k("failed"), *failed)
+        for key in set(finished) | set(failed):
+            pipe.delete(self._k(f"task:{key}"))
+        pipe.execute()
+        return len(set(finished) | set(failed))
+
+    def counts(self):
+        return {
+            "pending": self.client.llen(self._k("pending")),
+            "leased": self.client.zcard(self._k("leased")),
+            "done": self.client.hlen(self._k("results")),
+            "failed": self.client.scard(self._k("failed")),
+        }
+
+    def close(self):
+        self.client.close()
+# --- End Redis Backend ---
+
+
+def open_work_queue(spec, visibility_timeout=300, max_attempts=3):
+    """Opens a queue from 'redis://...' / 'rediss://...' URLs or a SQLite file path."""
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(spec, visibility_timeout=visibility_timeout, max_attempts=max_attempts)
+    return SQLiteWorkQueue(spec, visibility_timeout=visibility_timeout, max_attempts=max_attempts)
+
+
+def run_worker(queue, worker_id, handle_task, idle_timeout=30, poll_interval=1.0, after_task=None):
+    """
+    Leases and processes tasks until the queue has had nothing to do for idle_timeout seconds.
+    handle_task(task) returns a JSON-serializable result; exceptions release the task for retry.
+    after_task(task, ok), if given, runs after each task: ok=True when this worker's result was
+    committed, False when the task was released or another worker had already committed it.
+    Returns the number of results this worker committed.
+    """
+    committed = 0
+    idle_since = None
+    while True:
+        task = queue.lease(worker_id)
+        if task is None:
+            counts = queue.counts()
+            if counts["pending"] == 0 and counts["leased"] == 0:
+                return committed # Queue drained
+            idle_since = idle_since or time.time()
+            if time.time() - idle_since > idle_timeout:
+                return committed
+            time.sleep(poll_interval)
+            continue
+        idle_since = None
+        try:
+            result = handle_task(task)
+        except Exception as e:
+            print(f"[WARN] Worker {worker_id}: task '{task.key}' failed (attempt {task.attempts}): {e}")
+            queue.fail(task, e)
+            if after_task:
+                after_task(task, False)
+            continue
+        ok = queue.complete(task, result, worker_id)
+        committed += ok
+        if after_task:
+            after_task(task, ok)
+
+
+# --- Local Scaling Benchmark ---
+# Spawns N worker processes against one SQLite queue with simulated page work
+# (a sleep standing in for browser load/scroll time) and reports throughput.
+def _bench_worker(queue_path, worker_id, work_seconds):
+    queue = SQLiteWorkQueue(queue_path)
+
+    def handle(task):
+        time.sleep(work_seconds)
+        if task.payload["page"] == 0:
+            # The first page of each seed discovers the rest, like a real crawl
+            for page in range(1, task.payload["pages"]):
+                queue.enqueue(f"{task.payload['seed']}#p{page}", {"seed": task.payload["seed"], "page": page})
+        queue.claim_alert(f"alert:{task.payload['seed']}", worker_id)
+        return {"page": task.payload["page"]}
+
+    run_worker(queue, worker_id, handle, idle_timeout=2, poll_interval=0.05)
+    queue.close()
+
+
+def run_benchmark(worker_counts, seeds, pages, work_seconds):
+    print(f"Benchmark: {seeds} seeds x {pages} pages, {work_seconds * 1000:.0f} ms simulated work per page")
+    baseline = None
+    for n_workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            queue_path = os.path.join(tmp, "queue.sqlite")
+            queue = SQLiteWorkQueue(queue_path)
+            for seed in range(seeds):
+                queue.enqueue(f"seed{seed}#p0", {"seed": f"seed{seed}", "page": 0, "pages": pages})
+
+            start = time.perf_counter()
+            procs = [
+                multiprocessing.Process(target=_bench_worker, args=(queue_path, f"w{i}", work_seconds))
+                for i in range(n_workers)
+            ]
+            for p in procs: p.start()
+            for p in procs: p.join()
+            elapsed = time.perf_counter() - start
+
+            results = queue.results()
+            alerts = queue.conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+            queue.close()
+
+        throughput = len(results) / elapsed
+        baseline = baseline or throughput
+        ok = len(results) == seeds * pages and alerts == seeds
+        print(
+            f"  {n_workers:>2} worker(s): {len(results)} pages in {elapsed:.2f}s = {throughput:.1f} pages/s "
+            f"(x{throughput / baseline:.2f}), {alerts} alerts, {'OK' if ok else 'DUPLICATES/MISSING'}"
+        )
+        if not ok:
+            return False
+    return True
+# --- End Local Scaling Benchmark ---
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work-queue scaling benchmark (multi-process, local SQLite).")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seeds", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--work-ms", type=float, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.workers, args.seeds, args.pages, args.work_ms / 1000) else 1)